@@ -2,8 +2,17 @@ import os
 import pathlib
 import re
 import json
+import tempfile
+import argparse
+import multiprocessing
+import pymupdf
 import pymupdf4llm as pymu
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any
+from helper.courses import discover_courses, doc_type_from_path
+
+PAGES_PER_TASK = 20     # Page range converted by one worker
+MIN_TEXT_CHARS = 20     # Pages with images and less extractable text than this are OCR candidates
 
 def clean_text(text: str) -> str:
     """Clean up text by replacing multiple newlines and spaces with single ones."""
@@ -93,10 +102,84 @@ def split_md_by_headings(md_text: str) -> List[Dict[str, str]]:
     return chunks
 
     
-def process_pdf(docs_dir: str, course_id: str = "converted_markdown") -> str:
+def scan_pdf(pdf_path: str) -> Dict[str, Any]:
+    """
+    Cheap pre-check over the PDF's text layer (no rendering, no OCR).
+    Classifies pages as text or image-only and computes the font-size
+    heading map once for the whole document, so every page range is
+    converted with the same heading levels.
+
+    Pages with images but little text (scans, possibly with a stray text
+    layer) are OCR candidates; the ones with some text are also listed in
+    `thin_pages`, so their text is kept when OCR is off. Short pages
+    without images (e.g. title pages) are ordinary text pages.
+    """
+    text_pages, image_pages, thin_pages = [], [], []
+    with pymupdf.open(pdf_path) as doc:
+        for page in doc:
+            text_chars = len(page.get_text("text").strip())
+            has_images = bool(page.get_images(full=False))
+            if text_chars >= MIN_TEXT_CHARS or (text_chars and not has_images):
+                text_pages.append(page.number)
+            elif has_images:
+                image_pages.append(page.number)
+                if text_chars:
+                    thin_pages.append(page.number)
+            # Pages with neither text nor images are blank and dropped
+
+    layout_pages = sorted(text_pages + thin_pages)
+    hdr_info = pymu.IdentifyHeaders(pdf_path, pages=layout_pages) if layout_pages else None
+    return {"text_pages": text_pages, "image_pages": image_pages, "thin_pages": thin_pages, "hdr_info": hdr_info}
+
+def page_ranges(pages: List[int], size: int) -> List[List[int]]:
+    """Groups sorted page numbers into runs of at most `size` consecutive pages."""
+    ranges = []
+    for page in pages:
+        if ranges and len(ranges[-1]) < size and ranges[-1][-1] == page - 1:
+            ranges[-1].append(page)
+        else:
+            ranges.append([page])
+    return ranges
+
+def convert_pages(pdf_path: str, pages: List[int], hdr_info) -> str:
+    """Converts a page range of a PDF to Markdown (fast path, text layer only)."""
+    return pymu.to_markdown(pdf_path, pages=pages, hdr_info=hdr_info, show_progress=False)
+
+def ocr_pages(pdf_path: str, pages: List[int]) -> str:
+    """Slow path for image-only pages: OCR each page with unstructured."""
+    from unstructured.partition.pdf import partition_pdf  # heavy import, only needed for OCR
+
+    texts = []
+    with pymupdf.open(pdf_path) as doc:
+        for page_number in pages:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                page_pdf = os.path.join(tmp_dir, "page.pdf")
+                with pymupdf.open() as single:
+                    single.insert_pdf(doc, from_page=page_number, to_page=page_number)
+                    single.save(page_pdf)
+                elements = partition_pdf(filename=page_pdf, strategy="ocr_only")
+            texts.append("\n".join(el.text for el in elements if el.text))
+    return "\n\n".join(texts)
+
+def run_page_task(task: Dict[str, Any]) -> str:
+    if task["kind"] == "ocr":
+        return ocr_pages(task["pdf_path"], task["pages"])
+    return convert_pages(task["pdf_path"], task["pages"], task["hdr_info"])
+
+def process_pdf(docs_dir: str, course_id: str = "converted_markdown", output_dir: str = "data",
+                max_workers: int = None, pages_per_task: int = PAGES_PER_TASK, ocr: bool = False) -> str:
     """
     Processes all PDFs in a directory to Markdown using pymupdf4llm
     and saves the output to a JSON file.
+
+    Every PDF is split into page ranges that are converted in parallel
+    across all files of the course, then stitched back together in page
+    order before splitting by headings. Image-only pages are skipped, or
+    OCR'd on the slow path when `ocr=True`.
+
+    The records of the PDFs that did convert are still written, but a
+    RuntimeError is raised if any PDF failed or nothing was converted, so
+    the pipeline doesn't checkpoint the stage and retries it next run.
     """
     final_data = []
 
@@ -106,50 +189,98 @@ def process_pdf(docs_dir: str, course_id: str = "converted_markdown") -> str:
         return
     
     # List all PDF files in the directory
-    pdf_paths = [os.path.join(docs_dir, f) for f in os.listdir(docs_dir) if f.endswith('.pdf')]
+    pdf_paths = sorted(os.path.join(docs_dir, f) for f in os.listdir(docs_dir) if f.endswith('.pdf'))
     
     if not pdf_paths:
         print(f"[WARN] No PDFs found in {docs_dir} - Nothing to do...")
         return
     
+    # Spawn rather than fork: the pipeline calls this from a worker thread while other threads (torch, other stages) run
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Pass 1: pre-check every PDF
+        scans = {}
+        for pdf_path, future in [(p, pool.submit(scan_pdf, p)) for p in pdf_paths]:
+            try:
+                scans[pdf_path] = future.result()
+            except Exception as e:
+                print(f"[ERROR] Failed to scan {pdf_path}: {e}")
+
+        # Pass 2: convert page ranges from all PDFs in one shared pool
+        tasks = []
+        for pdf_path, scan in scans.items():
+            # Without OCR, the little text of scanned pages is still better than nothing
+            text_pages = scan["text_pages"] if ocr else sorted(scan["text_pages"] + scan["thin_pages"])
+            for pages in page_ranges(text_pages, pages_per_task):
+                tasks.append({"pdf_path": pdf_path, "kind": "text", "pages": pages, "hdr_info": scan["hdr_info"]})
+            if scan["image_pages"]:
+                if ocr:
+                    for pages in page_ranges(scan["image_pages"], pages_per_task):
+                        tasks.append({"pdf_path": pdf_path, "kind": "ocr", "pages": pages})
+                else:
+                    skipped = len(scan["image_pages"]) - len(scan["thin_pages"])
+                    print(f"[WARN] {len(scan['image_pages'])} pages of {pdf_path} look scanned; keeping the text layer of "
+                          f"{len(scan['thin_pages'])} and skipping {skipped} image-only pages (OCR disabled, see --ocr)")
+
+        futures = [pool.submit(run_page_task, task) for task in tasks]
+
+        parts = {pdf_path: [] for pdf_path in scans}
+        failed = set()
+        for task, future in zip(tasks, futures):
+            try:
+                parts[task["pdf_path"]].append((task["pages"][0], future.result()))
+            except Exception as e:
+                print(f"[ERROR] Failed to process pages {task['pages'][0]}-{task['pages'][-1]} of {task['pdf_path']}: {e}")
+                failed.add(task["pdf_path"])
+
+    failed.update(pdf_path for pdf_path in pdf_paths if pdf_path not in scans)
     for pdf_path in pdf_paths:
-        print(f"[INFO] Processing {pdf_path}...")
-        try:
-            # Use pymu to convert the entire PDF to a single Markdown string
-            md_text = pymu.to_markdown(pdf_path)
-
-            # Split the md into smaller chunks
-            chunks = split_md_by_headings(md_text)
-
-            for chunk in chunks:
-                final_data.append({
-                    "text": chunk['text'],
-                    "metadata": {
-                        "course_id": course_id,
-                        "source_path": pdf_path,
-                        **chunk["metadata"]
-                    }
-                })
-            
-            print(f"[INFO] Successfully converted and split {pdf_path} into {len(chunks)} chunks")
-        except Exception as e:
-            print(f"[ERROR] Failed to process {pdf_path}: {e}")
+        if pdf_path in failed:
+            continue
+
+        # Stitch the ranges back in page order so the heading hierarchy carries across range boundaries
+        md_text = "\n\n".join(md for _, md in sorted(parts[pdf_path], key=lambda part: part[0]))
+
+        # Split the md into smaller chunks
+        chunks = split_md_by_headings(md_text)
+
+        for chunk in chunks:
+            final_data.append({
+                "text": chunk['text'],
+                "metadata": {
+                    "course_id": course_id,
+                    "source_path": pdf_path,
+                    "doc_type": doc_type_from_path(pdf_path),
+                    **chunk["metadata"]
+                }
+            })
+        
+        print(f"[INFO] Successfully converted and split {pdf_path} into {len(chunks)} chunks")
     
     if final_data:
-        output_dir = "data"
         os.makedirs(output_dir, exist_ok=True)
         output_file = os.path.join(output_dir, f"{course_id}_data.json")
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(final_data, f, ensure_ascii=False, indent=4)
         print(f"[INFO] Successfully created {output_file} with {len(final_data)} records.")
     else:
-        print(f"[WARN] No records were generated for {course_id}.")
+        raise RuntimeError(f"No records were generated for {course_id}")
+    if failed:
+        raise RuntimeError(f"{len(failed)} PDF(s) of {course_id} failed to convert: {sorted(failed)}")
 
 if __name__ == "__main__":
     this_dir = os.path.dirname(__file__)
     root_dir = os.path.abspath(os.path.join(this_dir, ".."))
 
-    course_ids = ["F21CA", "F21NL"]  # Define the courses to process
+    parser = argparse.ArgumentParser(description="Convert each course's PDFs to heading-split Markdown chunks.")
+    parser.add_argument("--ocr", action="store_true",
+                        help="OCR image-only pages with unstructured (needs unstructured[pdf] and tesseract)")
+    args = parser.parse_args()
+
+    course_ids = discover_courses(os.path.join(root_dir, "pdfs"))
     for course_id in course_ids:
         course_docs_path = os.path.join(root_dir, "pdfs", (course_id.lower()))
-        process_pdf(course_id=course_id, docs_dir=course_docs_path)
\ No newline at end of file
+        try:
+            process_pdf(course_id=course_id, docs_dir=course_docs_path, output_dir=os.path.join(root_dir, "data"),
+                        ocr=args.ocr)
+        except RuntimeError as e:
+            print(f"[ERROR] {e}")
\ No newline at end of file
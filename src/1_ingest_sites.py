@@ -0,0 +1,23 @@
+import os
+import argparse
+from helper.site_crawler import process_site
+
+if __name__ == "__main__":
+    this_dir = os.path.dirname(__file__)
+    root_dir = os.path.abspath(os.path.join(this_dir, ".."))
+
+    parser = argparse.ArgumentParser(description="Crawl a course site (e.g. Google Sites) into ingest records.")
+    parser.add_argument("course_id", help="Course the site belongs to, e.g. F21CA")
+    parser.add_argument("urls", nargs="+", help="Start URL(s) of the site")
+    parser.add_argument("--max-pages", type=int, default=50)
+    parser.add_argument("--max-workers", type=int, default=8, help="Maximum concurrent HTTP requests")
+    args = parser.parse_args()
+
+    process_site(
+        start_urls=args.urls,
+        course_id=args.course_id,
+        output_dir=os.path.join(root_dir, "data"),
+        cache_dir=os.path.join(root_dir, "cache", "http"),
+        max_pages=args.max_pages,
+        max_workers=args.max_workers,
+    )
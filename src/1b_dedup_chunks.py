@@ -0,0 +1,50 @@
+import os
+import json
+from helper.dedup import dedup_records
+from helper.courses import discover_courses
+
+def load_course_records(data_dir: str, course_id: str) -> list:
+    """Loads every ingest output of a course (PDF chunks and, if crawled, site chunks)."""
+    records = []
+    for suffix in ("data", "site_data"):
+        input_file = os.path.join(data_dir, f"{course_id}_{suffix}.json")
+        if os.path.exists(input_file):
+            with open(input_file, "r", encoding="utf-8") as f:
+                records.extend(json.load(f))
+    return records
+
+def dedup_courses(data_dir: str, course_ids: list, threshold: float = 0.8) -> dict:
+    """
+    Near-duplicate detection across all given courses at once, writing
+    `{course_id}_dedup_data.json` per course for 2_gen_embeddings.py.
+    Returns {course_id: output_file}.
+    """
+    records = []
+    for course_id in course_ids:
+        records.extend(load_course_records(data_dir, course_id))
+
+    if not records:
+        print(f"[WARN] No ingest records found in {data_dir} - Nothing to do...")
+        return {}
+
+    deduped = dedup_records(records, threshold=threshold)
+    print(f"[INFO] Deduplicated {len(records)} chunks → {len(deduped)} canonical chunks")
+
+    outputs = {}
+    for course_id in course_ids:
+        course_records = [rec for rec in deduped if rec["metadata"].get("course_id") == course_id]
+        if not course_records:
+            continue
+        output_file = os.path.join(data_dir, f"{course_id}_dedup_data.json")
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(course_records, f, ensure_ascii=False, indent=4)
+        print(f"[INFO] Saved {len(course_records)} records → {output_file}")
+        outputs[course_id] = output_file
+    return outputs
+
+if __name__ == "__main__":
+    this_dir = os.path.dirname(__file__)
+    root_dir = os.path.abspath(os.path.join(this_dir, ".."))
+
+    course_ids = discover_courses(os.path.join(root_dir, "pdfs"))
+    dedup_courses(os.path.join(root_dir, "data"), course_ids)
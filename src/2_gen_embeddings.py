@@ -1,10 +1,33 @@
 import os
 import json
+import threading
 import numpy as np
 from tqdm import tqdm
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from helper.courses import discover_courses
+from helper.quantize import save_compressed, load_vector_modes
 
-def generate_embeddings(input_file, output_file, batch_size=32):
+_embed_model = None
+_embed_model_lock = threading.Lock()
+
+def get_embed_model():
+    """Loads the embedding model once per process and shares it between courses."""
+    global _embed_model
+    with _embed_model_lock:
+        if _embed_model is None:
+            _embed_model = HuggingFaceEmbedding(
+                model_name="BAAI/bge-small-en-v1.5",  # swap to large if resources allow
+                trust_remote_code=True,
+                cache_folder="./hf_cache"
+            )
+    return _embed_model
+
+def generate_embeddings(input_file, output_file, batch_size=32, vector_mode="float32"):
+    """
+    Embeds every record of `input_file` and saves them to `output_file`.
+    For a compressed `vector_mode` the vectors are also written as a
+    `<output>.<mode>.npz` artefact.
+    """
     # Load ingested data
     with open(input_file, "r", encoding="utf-8") as f:
         records = json.load(f)
@@ -12,11 +35,7 @@ def generate_embeddings(input_file, output_file, batch_size=32):
     print(f"[INFO] Loaded {len(records)} records from {input_file}")
 
     # Choose embedding model
-    embed_model = HuggingFaceEmbedding(
-        model_name="BAAI/bge-small-en-v1.5",  # swap to large if resources allow
-        trust_remote_code=True,
-        cache_folder="./hf_cache"
-    )
+    embed_model = get_embed_model()
 
     # Extract text
     texts = [rec["text"] if "text" in rec else rec["content"] for rec in records]
@@ -39,17 +58,23 @@ def generate_embeddings(input_file, output_file, batch_size=32):
 
     print(f"[INFO] Saved {len(records)} embeddings → {output_file}")
 
+    if vector_mode != "float32" and embeddings:
+        compressed_file = f"{os.path.splitext(output_file)[0]}.{vector_mode}.npz"
+        save_compressed(embeddings, compressed_file, vector_mode)
+        print(f"[INFO] Saved {vector_mode} embeddings → {compressed_file}")
+
 if __name__ == "__main__":
     # Work out repo root = parent of src/
     this_dir = os.path.dirname(__file__)
     root_dir = os.path.abspath(os.path.join(this_dir, ".."))
 
-    input_path = os.path.join(root_dir, "data", "F21CA_data.json")
-    output_path = os.path.join(root_dir, "data", "F21CA_embeddings.json")
-
-    generate_embeddings(input_path, output_path)
+    vector_modes = load_vector_modes(os.path.join(root_dir, "data", "vector_modes.json"))
 
-    input_path = os.path.join(root_dir, "data", "F21NL_data.json")
-    output_path = os.path.join(root_dir, "data", "F21NL_embeddings.json")
+    for course_id in discover_courses(os.path.join(root_dir, "pdfs")):
+        # Prefer the deduplicated chunks from 1b_dedup_chunks.py when they exist
+        input_path = os.path.join(root_dir, "data", f"{course_id}_dedup_data.json")
+        if not os.path.exists(input_path):
+            input_path = os.path.join(root_dir, "data", f"{course_id}_data.json")
+        output_path = os.path.join(root_dir, "data", f"{course_id}_embeddings.json")
 
-    generate_embeddings(input_path, output_path)
+        generate_embeddings(input_path, output_path, vector_mode=vector_modes.get(course_id, "float32"))
@@ -0,0 +1,103 @@
+import os
+import json
+import argparse
+import importlib
+from helper.courses import discover_courses
+from helper.faq import faq_sources, file_digests, load_curated, generate_pairs, merge_entries
+from helper.retrieval import embed_queries
+
+def load_previous(output_file: str) -> dict:
+    if not os.path.exists(output_file):
+        return {}
+    try:
+        with open(output_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def build_faq(course_id: str, docs_dir: str, data_file: str, curated_file: str, output_file: str,
+              generate: bool = True, force: bool = False) -> dict:
+    """
+    Builds `{course_id}_faq.json`: the curated pairs from `curated_file` plus
+    (with `generate`) pairs the LLM writes from the course_team / assessment /
+    timetable chunks in `data_file`, with every phrasing of every question
+    embedded. The digests of the source PDFs are stored alongside, so pairs
+    are only regenerated when those PDFs change.
+
+    If the LLM could not be reached for some chunks, the partial FAQ is still
+    written but without `sources`, and a RuntimeError is raised, so neither
+    this script nor the pipeline treats it as up to date on the next run.
+    """
+    sources = file_digests(faq_sources(docs_dir))
+    curated_digest = file_digests([curated_file]).get(os.path.basename(curated_file))
+    previous = load_previous(output_file)
+
+    failed = 0
+    sources_changed = force or previous.get("sources") != sources or previous.get("generated") != generate
+    if not sources_changed and previous.get("curated") == curated_digest:
+        print(f"[INFO] FAQ for {course_id} is up to date - skipping")
+        return previous
+
+    if not sources_changed:
+        # Only the curated file changed: keep the generated pairs instead of asking the LLM again
+        generated = [entry for entry in previous.get("entries", []) if entry["origin"] == "generated"]
+    elif generate and os.path.exists(data_file):
+        from helper.clients import OllamaChat
+        with open(data_file, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        generated, failed = generate_pairs(OllamaChat(), course_id, records)
+        print(f"[INFO] Generated {len(generated)} FAQ entries for {course_id}")
+    else:
+        if generate:
+            print(f"[WARN] Data file not found: {data_file}. Using curated FAQ entries only...")
+        generated = []
+
+    entries = merge_entries(load_curated(curated_file), generated)
+
+    # Questions are embedded like queries (with the model's query instruction), so the
+    # app can compare them with the query embedding it already computes for retrieval
+    embed_model = importlib.import_module("2_gen_embeddings").get_embed_model()
+    questions = [q for entry in entries for q in entry["questions"]]
+    embeddings = iter(embed_queries(embed_model, questions) if questions else [])
+    for entry in entries:
+        entry["embeddings"] = [next(embeddings) for _ in entry["questions"]]
+
+    faq = {
+        "course_id": course_id,
+        "sources": None if failed else sources,
+        "curated": curated_digest,
+        "generated": generate,
+        "entries": entries,
+    }
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(faq, f, ensure_ascii=False, indent=4)
+    print(f"[INFO] Saved {len(entries)} FAQ entries ({len(questions)} questions) → {output_file}")
+    if failed:
+        raise RuntimeError(f"The LLM was unavailable for {failed} FAQ chunks of {course_id}; they are retried on the next run")
+    return faq
+
+if __name__ == "__main__":
+    this_dir = os.path.dirname(__file__)
+    root_dir = os.path.abspath(os.path.join(this_dir, ".."))
+    data_dir = os.path.join(root_dir, "data")
+
+    parser = argparse.ArgumentParser(description="Build the per-course FAQ answer index checked before RAG.")
+    parser.add_argument("--courses", nargs="*", help="Only these courses (default: every directory in pdfs/)")
+    parser.add_argument("--no-generate", action="store_true", help="Only use the hand-written pairs in faq/")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the source PDFs are unchanged")
+    args = parser.parse_args()
+
+    for course_id in args.courses or discover_courses(os.path.join(root_dir, "pdfs")):
+        try:
+            build_faq(
+                course_id,
+                docs_dir=os.path.join(root_dir, "pdfs", course_id.lower()),
+                data_file=os.path.join(data_dir, f"{course_id}_data.json"),
+                curated_file=os.path.join(root_dir, "faq", f"{course_id}.json"),
+                output_file=os.path.join(data_dir, f"{course_id}_faq.json"),
+                generate=not args.no_generate,
+                force=args.force,
+            )
+        except RuntimeError as e:
+            print(f"[ERROR] {e}")
@@ -1,14 +1,41 @@
 import os
 import json
+import numpy as np
 from pymilvus import MilvusClient, DataType
+from helper.courses import discover_courses, collection_name, doc_type_from_path
+from helper.quantize import VECTOR_MODES, to_float16, to_binary, load_vector_modes
 
-def create_collection(client: MilvusClient, collection_name: str):
+EMBEDDING_DIM = 384
+# NOTE: "bge-small-en-v1.5" → 384 dims; if swap to bge-large, change to 1024
+
+# VARCHAR limits for the metadata columns; longer values are truncated on insert
+MAX_LENGTHS = {
+    "context": 8192,
+    "source_path": 1024,
+    "doc_type": 64,
+    "heading": 512,
+    "heading_path": 2048,
+}
+MAX_SOURCES = 64
+
+def create_collection(client: MilvusClient, collection_name: str, vector_mode: str = "float32"):
     """
-    Creates a new collection with a defined schema and an index for vector search
+    Creates a new collection with a defined schema and an index for vector search.
+
+    `vector_mode` trades memory for accuracy:
+    - float32: full-precision vectors (IVF_FLAT)
+    - float16: half-precision vectors (IVF_FLAT on FLOAT16_VECTOR)
+    - int8: full-precision input, int8 scalar-quantised index (IVF_SQ8)
+    - binary: sign-bit vectors searched by Hamming distance (BIN_IVF_FLAT),
+      plus float16 vectors used only to rescore the candidates
     """
+    if vector_mode not in VECTOR_MODES:
+        raise ValueError(f"Unknown vector mode '{vector_mode}', expected one of {VECTOR_MODES}")
+
+    # Every field is typed, so no per-row JSON storage for dynamic fields
     schema = client.create_schema(
         auto_id=True,
-        enable_dynamic_fields=True
+        enable_dynamic_field=False
     )
 
     # Add a primary key field - unique for each record
@@ -16,18 +43,52 @@ def create_collection(client: MilvusClient, collection_name: str):
 
     # Add other fields
     schema.add_field("course_id", DataType.VARCHAR, max_length=5)
-    schema.add_field("context", DataType.VARCHAR, max_length=8192)  # Increased max_length to 8192
-    schema.add_field("embedding", DataType.FLOAT_VECTOR, dim=384)
-    # NOTE: "bge-small-en-v1.5" → 384 dims; if swap to bge-large, change to 1024
+    schema.add_field("context", DataType.VARCHAR, max_length=MAX_LENGTHS["context"])  # Increased max_length to 8192
+
+    # Ingest metadata, kept as scalar columns for filtering and short citations
+    schema.add_field("source_path", DataType.VARCHAR, max_length=MAX_LENGTHS["source_path"])
+    schema.add_field("doc_type", DataType.VARCHAR, max_length=MAX_LENGTHS["doc_type"])
+    schema.add_field("heading", DataType.VARCHAR, max_length=MAX_LENGTHS["heading"])
+    schema.add_field("heading_level", DataType.INT64)
+    schema.add_field("heading_path", DataType.VARCHAR, max_length=MAX_LENGTHS["heading_path"])
+    schema.add_field("sources", DataType.ARRAY, element_type=DataType.VARCHAR,
+                     max_capacity=MAX_SOURCES, max_length=MAX_LENGTHS["source_path"])
+
+    if vector_mode in ("float16", "binary"):
+        schema.add_field("embedding", DataType.FLOAT16_VECTOR, dim=EMBEDDING_DIM)
+    else:
+        schema.add_field("embedding", DataType.FLOAT_VECTOR, dim=EMBEDDING_DIM)
+    if vector_mode == "binary":
+        schema.add_field("embedding_bin", DataType.BINARY_VECTOR, dim=EMBEDDING_DIM)
 
     # Define index
     index_params = client.prepare_index_params()
-    index_params.add_index(
-        field_name="embedding",
-        index_name="embedding_index",
-        index_type="IVF_FLAT",
-        metric_type="COSINE"
-    )
+    if vector_mode == "binary":
+        index_params.add_index(
+            field_name="embedding_bin",
+            index_name="embedding_bin_index",
+            index_type="BIN_IVF_FLAT",
+            metric_type="HAMMING"
+        )
+        # Rescoring vectors are only read back for candidates, never searched
+        index_params.add_index(
+            field_name="embedding",
+            index_name="embedding_index",
+            index_type="FLAT",
+            metric_type="COSINE"
+        )
+    else:
+        index_params.add_index(
+            field_name="embedding",
+            index_name="embedding_index",
+            index_type="IVF_SQ8" if vector_mode == "int8" else "IVF_FLAT",
+            metric_type="COSINE"
+        )
+
+    # Scalar indexes for the filterable metadata
+    index_params.add_index(field_name="doc_type", index_name="doc_type_index", index_type="INVERTED")
+    index_params.add_index(field_name="source_path", index_name="source_path_index", index_type="INVERTED")
+    index_params.add_index(field_name="heading_level", index_name="heading_level_index", index_type="STL_SORT")
 
     # Create collection
     client.create_collection(
@@ -35,9 +96,9 @@ def create_collection(client: MilvusClient, collection_name: str):
         schema=schema,
         index_params=index_params
     )
-    print(f"[INFO] Created collection '{collection_name}' with schema + index")
+    print(f"[INFO] Created collection '{collection_name}' with schema + index ({vector_mode} vectors)")
 
-def insert_embeddings(client, input_file, collection_name: str):
+def insert_embeddings(client, input_file, collection_name: str, vector_mode: str = "float32"):
     """
     Inserts data from a JSON file into the specified Milvus collection
     """
@@ -52,15 +113,28 @@ def insert_embeddings(client, input_file, collection_name: str):
     for rec in records:
         text = rec.get('text') or rec.get('content')
         embedding = rec.get('embedding')
-        course_id = rec.get('metadata', {}).get('course_id')
+        metadata = rec.get('metadata', {})
+        course_id = metadata.get('course_id')
         if embedding is None or course_id is None:
             continue
 
-        data.append({
-            'context': text,
+        source_path = metadata.get('source_path') or ""
+        row = {
+            'context': text[:MAX_LENGTHS['context']],
             'embedding': embedding,
-            'course_id': course_id
-        })
+            'course_id': course_id,
+            'source_path': source_path[:MAX_LENGTHS['source_path']],
+            'doc_type': (metadata.get('doc_type') or doc_type_from_path(source_path))[:MAX_LENGTHS['doc_type']],
+            'heading': (metadata.get('heading') or "")[:MAX_LENGTHS['heading']],
+            'heading_level': int(metadata.get('heading_level') or 0),
+            'heading_path': (metadata.get('heading_path') or "")[:MAX_LENGTHS['heading_path']],
+            'sources': [s[:MAX_LENGTHS['source_path']] for s in (metadata.get('sources') or [source_path])][:MAX_SOURCES],
+        }
+        if vector_mode in ("float16", "binary"):
+            row['embedding'] = to_float16(embedding)
+        if vector_mode == "binary":
+            row['embedding_bin'] = to_binary(np.asarray(embedding)).tobytes()
+        data.append(row)
     
     if data:
         client.insert(collection_name=collection_name, data=data)
@@ -69,23 +143,29 @@ def insert_embeddings(client, input_file, collection_name: str):
         print(f"[WARN] No records with embeddings found in {input_file}. No data inserted.")
 
 
+def index_course(client: MilvusClient, course_id: str, embeddings_file: str, vector_mode: str = "float32"):
+    """(Re)builds the collection of a course from its embeddings file."""
+    name = collection_name(course_id)
+
+    if client.has_collection(name):
+        client.drop_collection(name)
+        print(f"[INFO] Dropped old collection: {name}")
+
+    create_collection(client, name, vector_mode)
+    insert_embeddings(client, embeddings_file, name, vector_mode)
+
+
 if __name__ == '__main__':
     this_dir = os.path.dirname(__file__)
     root_dir = os.path.abspath(os.path.join(this_dir, ".."))
 
     client = MilvusClient(
-        uri="http://milvus_db:19530"
+        uri=os.getenv("MILVUS_URI", "http://milvus_db:19530")
     )
 
-    course_ids = ['F21CA', 'F21NL']
+    # Per-course storage mode chosen with eval_quantization.py; float32 if not set
+    vector_modes = load_vector_modes(os.path.join(root_dir, "data", "vector_modes.json"))
 
-    for course_id in course_ids:
-        collection_name = f"HWU_MACS_{course_id}"
+    for course_id in discover_courses(os.path.join(root_dir, "pdfs")):
         embeddings_file = os.path.join(root_dir, "data", f"{course_id}_embeddings.json")
-
-        if client.has_collection(collection_name):
-            client.drop_collection(collection_name)
-            print(f"[INFO] Dropped old collection: {collection_name}")
-
-        create_collection(client, collection_name)
-        insert_embeddings(client, embeddings_file, collection_name)
\ No newline at end of file
+        index_course(client, course_id, embeddings_file, vector_modes.get(course_id, "float32"))
\ No newline at end of file
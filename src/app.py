@@ -1,27 +1,45 @@
-import os
 import streamlit as st
-from pymilvus import MilvusClient
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-# from llama_index.llms.groq import Groq
-from llama_index.llms.ollama import Ollama
-from llama_index.core.base.llms.types import ChatMessage, MessageRole
+import os
 import hashlib
-
-# --- Environment Variables ---
-ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+import uuid
+from helper.clients import ResilientMilvus, OllamaChat, LRUCache, ServiceUnavailable
+from helper.session_store import store_from_env
+from helper.retrieval import (
+    search_collection, fetch_contexts, list_doc_types, doc_type_filter, format_citation, select_hits,
+    load_retrieval_thresholds, CITATION_FIELDS, DEFAULT_THRESHOLDS
+)
+from helper.faq import FaqIndex, FAQ_THRESHOLD
+from helper.query_embedder import load_query_embedder
 
 # --- Setup connections ---
-client = MilvusClient(
-    uri="http://milvus_db:19530"
-)
+# Shared by every session of this process instead of being rebuilt on each rerun.
+# Endpoints come from MILVUS_URI / OLLAMA_HOST (see helper/clients.py).
+@st.cache_resource
+def get_clients():
+    return ResilientMilvus(), OllamaChat(), LRUCache(max_entries=1024)
 
-embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-small-en-v1.5")
+# Chat history lives here rather than in st.session_state (SESSION_STORE=memory|sqlite)
+@st.cache_resource
+def get_session_store():
+    return store_from_env()
 
-llm = Ollama(
-    model="llama3",
-    request_timeout=300.0,
-    base_url=ollama_host
-)
+# ONNX encoder by default, so serving never imports torch (EMBED_BACKEND=huggingface to use llama_index)
+@st.cache_resource
+def get_embed_model():
+    return load_query_embedder()
+
+client, llm, answer_cache = get_clients()
+session_store = get_session_store()
+embed_model = get_embed_model()
+
+RENDER_WINDOW = 20      # Messages rendered per rerun; older ones behind "Show earlier messages"
+SEARCH_CACHE_SIZE = 32  # Cached searches per session
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+FAQ_THRESHOLD = float(os.getenv("FAQ_THRESHOLD", FAQ_THRESHOLD))
+
+UNAVAILABLE_MESSAGE = "The Learning Buddy is temporarily unavailable. Please try again in a minute."
+NO_ANSWER_MESSAGE = "I don’t know based on the available course information."
 
 COURSE_COLLECTIONS = {
     "F21CA": "HWU_MACS_F21CA",
@@ -30,16 +48,51 @@ COURSE_COLLECTIONS = {
 }
 
 # --- Simple cache helpers ---
-def get_cache_key(user_query: str, chat_history: list, course_id: str) -> str:
-    """Hash user query + recent history + course_id into a cache key."""
+def get_cache_key(user_query: str, chat_history: list, course_id: str, doc_types: list = ()) -> str:
+    """Hash user query + recent history + course_id + document filter into a cache key."""
     history_text = "".join([f"{m['role']}{m['content']}" for m in chat_history[-4:]])
-    return hashlib.sha256((user_query + history_text).encode()).hexdigest()
+    return hashlib.sha256((user_query + history_text + course_id + ",".join(doc_types)).encode()).hexdigest()
+
+@st.cache_data(ttl=600)
+def get_doc_types(collection_name: str) -> list:
+    try:
+        return list_doc_types(client, collection_name)
+    except ServiceUnavailable:
+        return []
+
+@st.cache_data(ttl=15)
+def backends_ready() -> dict:
+    """Readiness probes, re-checked at most every 15 s."""
+    return {"Milvus": client.is_ready(), "Ollama": llm.is_ready()}
+
+# Keyed on the file's mtime, so a rebuilt FAQ index is picked up without restarting the app
+@st.cache_resource(max_entries=8)
+def load_faq_index(path: str, mtime: float) -> FaqIndex:
+    return FaqIndex.load(path)
+
+def get_faq_index(course_id: str):
+    """Precomputed answers for the course (built by 2b_build_faq.py), or None."""
+    path = os.path.join(DATA_DIR, f"{course_id}_faq.json")
+    if not os.path.exists(path):
+        return None
+    return load_faq_index(path, os.path.getmtime(path))
+
+@st.cache_resource(max_entries=8)
+def load_thresholds(path: str, mtime: float) -> dict:
+    return load_retrieval_thresholds(path)
+
+def get_thresholds(course_id: str) -> dict:
+    """Score-aware retrieval thresholds for the course (calibrate_retrieval.py), or the defaults."""
+    path = os.path.join(DATA_DIR, "retrieval_thresholds.json")
+    if not os.path.exists(path):
+        return DEFAULT_THRESHOLDS
+    return load_thresholds(path, os.path.getmtime(path)).get(course_id, DEFAULT_THRESHOLDS)
 
 def get_from_cache(cache_name: str, key: str):
-    return st.session_state[cache_name].get(key, None)
+    return st.session_state[cache_name].get(key)
 
 def set_cache(cache_name: str, key: str, value):
-    st.session_state[cache_name][key] = value
+    st.session_state[cache_name].set(key, value)
 
 def rewrite_query(user_query: str, chat_history: list, llm) -> str:
     """
@@ -59,22 +112,40 @@ def rewrite_query(user_query: str, chat_history: list, llm) -> str:
     )
 
     # Just a single-turn call to the LLM
-    rewrite_response = llm.chat([ChatMessage(role=MessageRole.USER, content=prompt)])
-    return rewrite_response.message.content.strip()
+    rewrite_response = llm.chat([{"role": "user", "content": prompt}])
+    return rewrite_response.strip()
+
+def summarise_history(previous_summary: str, messages: list) -> str:
+    """Fold older turns into the rolling conversation summary (called by SessionStore.fold_history)."""
+    turns = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    prompt = (
+        "Update the summary of a conversation between a student and a course assistant. "
+        "Keep the course facts, questions and answers that later questions may refer to. "
+        "Reply with the updated summary only, in at most 150 words.\n\n"
+        f"Current summary:\n{previous_summary or '(none)'}\n\n"
+        f"New turns:\n{turns}\n\n"
+        "Updated summary:"
+    )
+    return llm.chat([{"role": "user", "content": prompt}]).strip()
 
 # --- Streamlit UI ---
 
-# Initialise session state for app view
-if "current_view" not in st.session_state:
-    st.session_state.current_view = "selection"
+# Initialise session state for app view. The session id and course are kept in the URL
+# (?session=...&course=...) so a refresh or app restart reopens the same stored chat.
+if "session_id" not in st.session_state:
+    st.session_state.session_id = st.query_params.get("session") or uuid.uuid4().hex
+    st.query_params["session"] = st.session_state.session_id
 if "selected_course_id" not in st.session_state:
-    st.session_state.selected_course_id = None
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-if "rewrite_cache" not in st.session_state:
-    st.session_state.rewrite_cache = {}
+    course = st.query_params.get("course")
+    st.session_state.selected_course_id = course if course in COURSE_COLLECTIONS else None
+if "current_view" not in st.session_state:
+    st.session_state.current_view = "chat" if st.session_state.selected_course_id else "selection"
+if "render_window" not in st.session_state:
+    st.session_state.render_window = RENDER_WINDOW
 if "search_cache" not in st.session_state:
-    st.session_state.search_cache = {}
+    st.session_state.search_cache = LRUCache(max_entries=SEARCH_CACHE_SIZE)
+
+session_id = st.session_state.session_id
 
 #  --- Selection Page ---
 if st.session_state.current_view == "selection":
@@ -85,7 +156,10 @@ if st.session_state.current_view == "selection":
 
     if st.button("Start Chat"):
         st.session_state.selected_course_id = selected_course
-        st.session_state.messages = []
+        st.query_params["course"] = selected_course
+        session_store.reset(session_id)
+        st.session_state.search_cache = LRUCache(max_entries=SEARCH_CACHE_SIZE)
+        st.session_state.render_window = RENDER_WINDOW
         st.session_state.current_view = "chat"
         st.rerun()
 
@@ -94,74 +168,117 @@ elif st.session_state.current_view == "chat":
     current_course_id = st.session_state.selected_course_id
     st.title(f"{current_course_id} Learning Buddy")
 
+    collection_name = COURSE_COLLECTIONS[current_course_id]
+
     # Button to go back to scourse selection
     if st.sidebar.button("Change Course"):
+        st.query_params.pop("course", None)
         st.session_state.current_view = "selection"
         st.rerun()
 
-    # Display chat messages from history on app rerun
-    for message in st.session_state.messages:
+    not_ready = [name for name, ready in backends_ready().items() if not ready]
+    if not_ready:
+        st.warning(f"{' and '.join(not_ready)} not reachable yet - answers may be delayed or unavailable.")
+
+    # Optionally restrict the search to some document types (e.g. assessment, timetable)
+    selected_doc_types = st.sidebar.multiselect("Search only these documents", get_doc_types(collection_name))
+
+    # Display the most recent chat messages on app rerun; older ones only on request
+    messages = session_store.get(session_id)["messages"]
+    hidden = len(messages) - st.session_state.render_window
+    if hidden > 0 and st.button(f"Show earlier messages ({hidden})"):
+        st.session_state.render_window += RENDER_WINDOW
+        st.rerun()
+    for message in messages[-st.session_state.render_window:]:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
+            if message.get("sources"):
+                st.caption("Sources: " + "; ".join(message["sources"]))
 
     if prompt := st.chat_input("Enter your question:"):
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        session_store.append(session_id, {"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        with st.spinner("Thinking..."):
-            # --- Cached rewriting ---
-            rewritten_query = rewrite_query(prompt, st.session_state.messages, llm)
+        # Searches only depend on the question; answers also on the conversation so far, so a
+        # follow-up never gets an answer cached for someone else's conversation
+        search_cache_key = get_cache_key(prompt, [], current_course_id, selected_doc_types)
+        answer_key = get_cache_key(prompt, session_store.get(session_id)["messages"][:-1], current_course_id, selected_doc_types)
+        citations = []
 
-            # --- Cached search ---
-            search_cache_key = hashlib.sha256((prompt + current_course_id).encode()).hexdigest()
-            cached_results = get_from_cache("search_cache", search_cache_key)
+        with st.spinner("Thinking..."):
+            # --- Precomputed FAQ answers: a confident match skips retrieval and the LLM ---
+            query_embed = embed_model.get_query_embedding(prompt)
+            faq_index = get_faq_index(current_course_id)
+            faq_entry, faq_score = faq_index.match(query_embed, FAQ_THRESHOLD) if faq_index else (None, 0.0)
 
-            if cached_results:
-                context_chunks = cached_results
+            if faq_entry:
+                print(f"[INFO] Answered from the {current_course_id} FAQ (score {faq_score:.3f})")
+                answer = faq_entry["answer"]
+                citations = [f"FAQ: {faq_entry['source']}" if faq_entry.get("source") else "FAQ"]
             else:
-                collection_name = COURSE_COLLECTIONS[current_course_id]
-                query_embed = embed_model.get_query_embedding(prompt)
-                results = client.search(
-                    collection_name=collection_name,
-                    data=[query_embed],
-                    anns_field="embedding",
-                    search_params={'metric_type': 'COSINE', 'params': {'nprobe': 10}},
-                    output_fields=['context'],
-                    limit=5,
-                )
-                context_chunks = [hit['entity']['context'] for hit in results[0]]
-                set_cache("search_cache", search_cache_key, context_chunks)
-
-            full_context = "\n".join(context_chunks)
-
-            system_prompt = ChatMessage(
-                role=MessageRole.SYSTEM,
-                content=(
-                    "You are a helpful and approachable course assistant for HWU students. "
-                    "Your goal is to answer questions using ONLY the provided CONTEXT. "
-                    "This CONTEXT is in Markdown format. "
-                    "First, identify the key FACTS from the CONTEXT that directly address the user's query. "
-                    "Then, use those FACTS to construct your final answer. "
-                    "If the CONTEXT does not contain enough information to answer, respond with: 'I don’t know based on the available course information.' \n"
-                    "Do not generate advice, instructions, or help unrelated to the retrieved context."
-                    "Do not assist with assignments, essays, reports, quizzes, or courseworks"
-                    "Keep answers concise and factual.\n\n"
-                    f"Course: {current_course_id}\n"
-                    f"Original query: {prompt}\n"
-                    # f"Rewritten query: {rewritten_query}\n\n"
-                    f"CONTEXT:\n{full_context}"
-                )
-            )
-
-            # Reconstruct full history for LLM
-            full_chat_history = [system_prompt] + [
-                ChatMessage(role=m['role'], content=m['content']) for m in st.session_state.messages
-            ]
-            
-            # Pass full conversation history to LLM
-            response = llm.chat(full_chat_history)
+                try:
+                    # --- Cached search ---
+                    cached_results = get_from_cache("search_cache", search_cache_key)
+
+                    if cached_results:
+                        context_chunks, citations = cached_results
+                    else:
+                        # Search returns only short citation fields; full text is fetched for the hits used in the prompt
+                        thresholds = get_thresholds(current_course_id)
+                        hits = search_collection(
+                            client, collection_name, query_embed, limit=thresholds["max_k"],
+                            output_fields=CITATION_FIELDS, filter=doc_type_filter(selected_doc_types)
+                        )
+                        # Only the hits that score close to the best one; none if even the best is off-topic
+                        hits = select_hits(hits, thresholds)
+                        context_chunks = fetch_contexts(client, collection_name, hits)
+                        citations = list(dict.fromkeys(format_citation(hit) for hit in hits))
+                        set_cache("search_cache", search_cache_key, (context_chunks, citations))
+
+                    if not context_chunks:
+                        # Nothing relevant enough was retrieved: answer straight away instead of prompting the LLM
+                        answer = NO_ANSWER_MESSAGE
+                    else:
+                        full_context = "\n".join(context_chunks)
+
+                        system_prompt = {
+                            "role": "system",
+                            "content": (
+                                "You are a helpful and approachable course assistant for HWU students. "
+                                "Your goal is to answer questions using ONLY the provided CONTEXT. "
+                                "This CONTEXT is in Markdown format. "
+                                "First, identify the key FACTS from the CONTEXT that directly address the user's query. "
+                                "Then, use those FACTS to construct your final answer. "
+                                "If the CONTEXT does not contain enough information to answer, respond with: 'I don’t know based on the available course information.' \n"
+                                "Do not generate advice, instructions, or help unrelated to the retrieved context."
+                                "Do not assist with assignments, essays, reports, quizzes, or courseworks"
+                                "Keep answers concise and factual.\n\n"
+                                f"Course: {current_course_id}\n"
+                                f"Original query: {prompt}\n"
+                                # f"Rewritten query: {rewritten_query}\n\n"
+                                f"CONTEXT:\n{full_context}"
+                            )
+                        }
+
+                        # Reconstruct history for LLM: rolling summary + recent window
+                        full_chat_history = [system_prompt] + session_store.fold_history(session_id, summarise_history)
+
+                        # Pass full conversation history to LLM
+                        answer = llm.chat(full_chat_history)
+                        answer_cache.set(answer_key, (answer, citations))
+                except ServiceUnavailable as e:
+                    print(f"[WARN] {e}")
+                    # Serve a recent answer to the same question if there is one, otherwise fail fast
+                    cached_answer = answer_cache.get(answer_key)
+                    if cached_answer:
+                        answer, citations = cached_answer
+                        answer += "\n\n_(Served from recent answers while the assistant is unavailable.)_"
+                    else:
+                        answer = UNAVAILABLE_MESSAGE
 
         with st.chat_message("assistant"):
-            st.markdown(response.message.content)
-            st.session_state.messages.append({"role": "assistant", "content": response.message.content})
\ No newline at end of file
+            st.markdown(answer)
+            if citations:
+                st.caption("Sources: " + "; ".join(citations))
+            session_store.append(session_id, {"role": "assistant", "content": answer, "sources": citations})
\ No newline at end of file
@@ -0,0 +1,115 @@
+import os
+import json
+import argparse
+import numpy as np
+from helper.courses import discover_courses
+from helper.quantize import cosine_scores
+from helper.retrieval import DEFAULT_THRESHOLDS, select_hits, load_retrieval_thresholds
+from eval_retrieval import load_corpus, relevant_ids, load_query_embeddings
+
+def ranked_hits(query: np.ndarray, vectors: np.ndarray, max_k: int) -> list:
+    """Exact cosine top-`max_k` as Milvus-style hits ({'id', 'distance'}), best first."""
+    scores = cosine_scores(query[None, :], vectors)[0]
+    order = np.argsort(-scores, kind="stable")[:max_k]
+    return [{"id": int(idx), "distance": float(scores[idx])} for idx in order]
+
+def calibrate(answerable: list, unanswerable: list, max_k: int, max_misses: float, margin: float) -> dict:
+    """
+    Thresholds from the labelled questions. `answerable` holds (hits,
+    relevant ids) pairs and `unanswerable` the hits of off-topic questions.
+    The cutoff must not refuse more than a `max_misses` fraction of the
+    answerable questions. Within that limit it sits halfway between them and
+    the best-scoring unanswerable question. `window` and `gap` are wide
+    enough to keep the last relevant hit of all but that fraction.
+    """
+    tops, drops, gaps = [], [], []
+    for hits, relevant in answerable:
+        scores = [hit["distance"] for hit in hits]
+        tops.append(scores[0])
+        ranks = [rank for rank, hit in enumerate(hits) if hit["id"] in relevant]
+        if not ranks:
+            continue
+        last = max(ranks)
+        drops.append(scores[0] - scores[last])
+        gaps.append(max([scores[i - 1] - scores[i] for i in range(1, last + 1)], default=0.0))
+
+    cutoff = float(np.quantile(tops, max_misses, method="lower")) - margin
+    if unanswerable:
+        floor = max(hits[0]["distance"] for hits in unanswerable if hits) + margin
+        if floor < cutoff:
+            cutoff = (floor + cutoff) / 2
+
+    return {
+        "cutoff": round(cutoff, 4),
+        "window": round(float(np.quantile(drops, 1 - max_misses, method="higher")) + margin, 4) if drops else DEFAULT_THRESHOLDS["window"],
+        "gap": round(float(np.quantile(gaps, 1 - max_misses, method="higher")) + margin, 4) if gaps else DEFAULT_THRESHOLDS["gap"],
+        "min_k": 1,
+        "max_k": max_k,
+    }
+
+def evaluate(thresholds: dict, answerable: list, unanswerable: list) -> dict:
+    """What select_hits does with these thresholds on the labelled questions."""
+    kept = [select_hits(hits, thresholds) for hits, _ in answerable]
+    return {
+        "answered": float(np.mean([bool(k) for k in kept])) if kept else 0.0,
+        "relevant_kept": float(np.mean([any(hit["id"] in rel for hit in k) for k, (_, rel) in zip(kept, answerable)])) if kept else 0.0,
+        "refused_unanswerable": float(np.mean([not select_hits(hits, thresholds) for hits in unanswerable])) if unanswerable else float("nan"),
+        "mean_k": float(np.mean([len(k) for k in kept if k])) if any(kept) else 0.0,
+    }
+
+if __name__ == "__main__":
+    this_dir = os.path.dirname(__file__)
+    root_dir = os.path.abspath(os.path.join(this_dir, ".."))
+    data_dir = os.path.join(root_dir, "data")
+
+    parser = argparse.ArgumentParser(description="Calibrate the score-aware retrieval thresholds per course.")
+    parser.add_argument("--max-k", type=int, default=DEFAULT_THRESHOLDS["max_k"])
+    parser.add_argument("--max-misses", type=float, default=0.05,
+                        help="Fraction of answerable questions allowed to lose their relevant chunk or be refused")
+    parser.add_argument("--margin", type=float, default=0.02, help="Safety margin added to every threshold")
+    parser.add_argument("--questions", default=os.path.join(data_dir, "retrieval_questions.json"))
+    parser.add_argument("--query-cache", default=os.path.join(data_dir, "retrieval_query_embeddings.json"))
+    parser.add_argument("--write", action="store_true", help="Save the thresholds to data/retrieval_thresholds.json")
+    args = parser.parse_args()
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        labelled = json.load(f)
+    output_file = os.path.join(data_dir, "retrieval_thresholds.json")
+    thresholds = load_retrieval_thresholds(output_file)
+
+    for course_id in discover_courses(os.path.join(root_dir, "pdfs")):
+        embeddings_file = os.path.join(data_dir, f"{course_id}_embeddings.json")
+        if not os.path.exists(embeddings_file) or not labelled.get(course_id):
+            print(f"[WARN] No embeddings or labelled questions for {course_id}. Skipping...")
+            continue
+
+        records, _, vectors = load_corpus(embeddings_file)
+        items = labelled[course_id]
+        queries = load_query_embeddings([item["question"] for item in items], args.query_cache)
+
+        answerable, unanswerable = [], []
+        for item, query in zip(items, queries):
+            hits = ranked_hits(query, vectors, args.max_k)
+            relevant = relevant_ids(records, item["expected"])
+            if not item["expected"]:
+                unanswerable.append(hits)
+            elif relevant:
+                answerable.append((hits, relevant))
+        if not answerable:
+            print(f"[WARN] No answerable questions match the chunks of {course_id}. Skipping...")
+            continue
+
+        calibrated = calibrate(answerable, unanswerable, args.max_k, args.max_misses, args.margin)
+        print(f"[INFO] {course_id}: {len(answerable)} answerable / {len(unanswerable)} unanswerable questions")
+        fixed = {**DEFAULT_THRESHOLDS, "cutoff": -1.0, "window": 2.0, "gap": 2.0}  # plain top-k, for comparison
+        for name, values in (("fixed", fixed), ("default", DEFAULT_THRESHOLDS), ("calibrated", calibrated)):
+            stats = evaluate(values, answerable, unanswerable)
+            print(f"    {name:<10} answered={stats['answered']:.2f}  relevant kept={stats['relevant_kept']:.2f}  "
+                  f"unanswerable refused={stats['refused_unanswerable']:.2f}  mean k={stats['mean_k']:.2f}")
+        print(f"    thresholds: {calibrated}")
+        thresholds[course_id] = calibrated
+
+    if args.write and thresholds:
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(thresholds, f, indent=4)
+        print(f"[INFO] Saved retrieval thresholds → {output_file}")
@@ -0,0 +1,110 @@
+import os
+import re
+import ast
+import sys
+import json
+import argparse
+import subprocess
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+APP_FILE = os.path.join(SRC_DIR, "app.py")
+
+# Modules the query path must not import: they are only needed for offline embedding
+FORBIDDEN = ["torch", "transformers", "sentence_transformers", "llama_index"]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# Run in a fresh interpreter: import the serving modules, optionally load the embedder and embed one query
+PROBE = r"""
+import sys, json, time, resource
+started = time.perf_counter()
+for name in MODULES:
+    __import__(name)
+imported = time.perf_counter()
+result = {"import_s": imported - started}
+if BACKEND:
+    from helper.query_embedder import load_query_embedder
+    model = load_query_embedder(BACKEND)
+    loaded = time.perf_counter()
+    model.get_query_embedding("When is the coursework deadline?")
+    result.update(load_s=loaded - imported, first_query_s=time.perf_counter() - loaded, embedder=type(model).__name__)
+result["total_s"] = time.perf_counter() - started
+result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+result["forbidden_loaded"] = sorted({m.split(".")[0] for m in sys.modules} & set(FORBIDDEN))
+print(json.dumps(result))
+"""
+
+def serving_imports(app_file: str = APP_FILE) -> list:
+    """Top-level modules imported by the app file (what a replica pays for before the first rerun)."""
+    with open(app_file, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+def run_probe(modules: list, backend: str = None, importtime: bool = False):
+    """Runs PROBE in a subprocess from src/. Returns (result dict, -X importtime report lines)."""
+    code = PROBE.replace("MODULES", repr(modules)).replace("BACKEND", repr(backend)).replace("FORBIDDEN", repr(FORBIDDEN))
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    proc = subprocess.run(command, cwd=SRC_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "probe failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr.splitlines()
+
+def slowest_imports(report: list, top: int = 10) -> list:
+    """(cumulative ms, module) of the slowest top-level imports in a -X importtime report."""
+    slowest = []
+    for line in report:
+        match = IMPORTTIME_LINE.match(line)
+        if match and len(match.group(3)) <= 1:
+            slowest.append((int(match.group(2)) / 1000, match.group(4)))
+    return sorted(slowest, reverse=True)[:top]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time and memory budget check for the query-serving app.")
+    parser.add_argument("--budget-ms", type=float, default=2000, help="Maximum time to import the app's modules")
+    parser.add_argument("--backends", nargs="*", default=[],
+                        help="Also load these embedders (onnx, huggingface) and report startup time and RSS")
+    args = parser.parse_args()
+
+    modules = serving_imports()
+    print(f"[INFO] app.py imports: {', '.join(modules)}")
+
+    try:
+        result, report = run_probe(modules, importtime=True)
+    except RuntimeError as e:
+        print(f"[ERROR] Could not import the app's modules: {e}")
+        raise SystemExit(1)
+    import_ms = result["import_s"] * 1000
+    print(f"[INFO] Import time {import_ms:,.0f} ms (budget {args.budget_ms:,.0f} ms), max RSS {result['max_rss_mb']:,.0f} MB")
+    for cumulative_ms, module in slowest_imports(report):
+        print(f"    {cumulative_ms:>9,.1f} ms  {module}")
+
+    failures = []
+    if import_ms > args.budget_ms:
+        failures.append(f"import time {import_ms:,.0f} ms is over the {args.budget_ms:,.0f} ms budget")
+    if result["forbidden_loaded"]:
+        failures.append(f"serving imports pull in {', '.join(result['forbidden_loaded'])}")
+
+    # Startup cost per replica: imports + embedder load + first query, in a fresh process per backend
+    for backend in args.backends:
+        try:
+            measured, _ = run_probe(modules, backend=backend)
+        except RuntimeError as e:
+            print(f"[WARN] {backend}: {e}")
+            continue
+        print(
+            f"[INFO] {backend:<12} ({measured['embedder']}) startup {measured['total_s']:.2f} s "
+            f"(imports {measured['import_s']:.2f} s, model load {measured['load_s']:.2f} s, "
+            f"first query {measured['first_query_s'] * 1000:.0f} ms), max RSS {measured['max_rss_mb']:,.0f} MB"
+        )
+
+    if failures:
+        for failure in failures:
+            print(f"[ERROR] {failure}")
+        raise SystemExit(1)
+    print("[INFO] Import budget OK")
@@ -0,0 +1,108 @@
+import os
+import json
+import argparse
+import numpy as np
+from helper.courses import discover_courses, collection_name
+from helper.quantize import VECTOR_MODES, BYTES_PER_DIM, search, recall_at_k
+
+def load_embeddings(embeddings_file: str):
+    with open(embeddings_file, "r", encoding="utf-8") as f:
+        records = [rec for rec in json.load(f) if rec.get("embedding") is not None]
+    texts = [rec.get("text") or rec.get("content") for rec in records]
+    return texts, np.asarray([rec["embedding"] for rec in records], dtype=np.float32)
+
+def leave_one_out(reference: np.ndarray, candidates: np.ndarray, k: int):
+    """Drops each query's own chunk from its result lists and keeps the top-k of the rest."""
+    ref, cand = [], []
+    for i, (r, c) in enumerate(zip(reference, candidates)):
+        ref.append([idx for idx in r if idx != i][:k])
+        cand.append([idx for idx in c if idx != i][:k])
+    return ref, cand
+
+def offline_recall(vectors: np.ndarray, k: int, rescore_candidates: int = None) -> dict:
+    """
+    Recall@k of every compressed mode against exact float32 search, using each
+    chunk's embedding as a query for its nearest neighbours. A mode's recall
+    is None when the check can't tell it apart from exact search: every
+    other chunk fits in the top-k, or (binary) the rescoring candidates
+    cover the whole corpus.
+    """
+    reference = search(vectors, vectors, k + 1, mode="float32")
+    recalls = {}
+    for mode in VECTOR_MODES:
+        if k >= len(vectors) - 1 or (mode == "binary" and (rescore_candidates or 4 * (k + 1)) >= len(vectors)):
+            recalls[mode] = None
+            continue
+        candidates = search(vectors, vectors, k + 1, mode=mode, rescore_candidates=rescore_candidates)
+        recalls[mode] = recall_at_k(*leave_one_out(reference, candidates, k))
+    return recalls
+
+def milvus_recall(client, course_id: str, texts: list, vectors: np.ndarray, k: int) -> float:
+    """Recall@k of the live collection (in whatever mode it was built) against exact float32 search."""
+    from helper.retrieval import search_collection
+
+    reference = search(vectors, vectors, k, mode="float32")
+    hits = [
+        search_collection(client, collection_name(course_id), vector.tolist(), limit=k, output_fields=["context"])
+        for vector in vectors
+    ]
+    expected = [[texts[idx] for idx in ids] for ids in reference]
+    found = [[hit["entity"]["context"] for hit in query_hits] for query_hits in hits]
+    return float(np.mean([len(set(e) & set(f)) / len(e) for e, f in zip(expected, found)]))
+
+def choose_mode(recalls: dict, target: float) -> str:
+    """Mode with the smallest stored footprint whose measured recall meets the target."""
+    for mode in sorted(VECTOR_MODES, key=BYTES_PER_DIM.get):
+        if recalls.get(mode) is not None and recalls[mode] >= target:
+            return mode
+    return "float32"
+
+if __name__ == "__main__":
+    this_dir = os.path.dirname(__file__)
+    root_dir = os.path.abspath(os.path.join(this_dir, ".."))
+    data_dir = os.path.join(root_dir, "data")
+
+    parser = argparse.ArgumentParser(description="Recall check of compressed vectors against float32 search.")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--target", type=float, default=0.95, help="Minimum recall@k for a mode to be chosen")
+    parser.add_argument("--rescore-candidates", type=int, default=None, help="Binary mode candidates (default 4 * k)")
+    parser.add_argument("--milvus-uri", default=None, help="Also check the live collections in this Milvus instance")
+    parser.add_argument("--write", action="store_true", help="Save the chosen modes to data/vector_modes.json")
+    args = parser.parse_args()
+
+    client = None
+    if args.milvus_uri:
+        from pymilvus import MilvusClient
+        client = MilvusClient(uri=args.milvus_uri)
+
+    chosen = {}
+    for course_id in discover_courses(os.path.join(root_dir, "pdfs")):
+        embeddings_file = os.path.join(data_dir, f"{course_id}_embeddings.json")
+        if not os.path.exists(embeddings_file):
+            print(f"[WARN] Embeddings file not found: {embeddings_file}. Skipping...")
+            continue
+
+        texts, vectors = load_embeddings(embeddings_file)
+        if len(vectors) < 2:
+            print(f"[WARN] Not enough embeddings in {embeddings_file} for a recall check. Skipping...")
+            continue
+
+        recalls = offline_recall(vectors, args.k, args.rescore_candidates)
+        print(f"[INFO] {course_id}: {len(vectors)} vectors, dim {vectors.shape[1]}")
+        for mode, recall in recalls.items():
+            size_kb = len(vectors) * vectors.shape[1] * BYTES_PER_DIM[mode] / 1024
+            note = " (bits + float16 rescoring vectors)" if mode == "binary" else ""
+            shown = f"{recall:.3f}" if recall is not None else "n/a (corpus too small for this check)"
+            print(f"    {mode:<8} recall@{args.k}={shown}  vectors={size_kb:,.1f} KB{note}")
+
+        if client is not None:
+            print(f"    milvus   recall@{args.k}={milvus_recall(client, course_id, texts, vectors, args.k):.3f}")
+
+        chosen[course_id] = choose_mode(recalls, args.target)
+        print(f"[INFO] {course_id}: smallest mode with recall@{args.k} >= {args.target} is {chosen[course_id]}")
+
+    if args.write and chosen:
+        output_file = os.path.join(data_dir, "vector_modes.json")
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(chosen, f, indent=4)
+        print(f"[INFO] Saved vector modes → {output_file}")
@@ -2,10 +2,11 @@ import gspread
 from google.oauth2.service_account import Credentials
 import os
 import json
-from pymilvus import MilvusClient
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.llms.ollama import Ollama
 from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from helper.retrieval import retrieve_many, select_hits, load_retrieval_thresholds, DEFAULT_THRESHOLDS
+from helper.clients import ResilientMilvus, OLLAMA_HOST, OLLAMA_MODEL
 
 # --- Setup for Google Sheets ---
 SERVICE_ACCOUNT_FILE = r'C:\Users\hamza\Documents\Heriot-Watt\HWU-AI-Learning-Buddy-Copilot\notebooks\learning-buddy-099-22b47deab465.json'
@@ -27,14 +28,14 @@ except Exception as e:
 
 # --- Setup connections from your app.py script ---
 # These are configured to connect to your local Ollama and Milvus instances
-milvus_uri = "http://localhost:19530"
-client = MilvusClient(uri=milvus_uri)
+client = ResilientMilvus()  # MILVUS_URI, defaults to http://localhost:19530
 
 embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-small-en-v1.5")
 
 llm = Ollama(
-    model="llama3",
+    model=OLLAMA_MODEL,
     request_timeout=300.0,
+    base_url=OLLAMA_HOST
 )
 
 # Your collection names based on the app.py script
@@ -43,6 +44,12 @@ COURSE_COLLECTIONS = {
     "F21NL": "HWU_MACS_F21NL",
 }
 
+# Same score-aware retrieval as app.py (see calibrate_retrieval.py)
+RETRIEVAL_THRESHOLDS = load_retrieval_thresholds(
+    os.path.join(os.path.dirname(__file__), "..", "data", "retrieval_thresholds.json")
+)
+NO_ANSWER_MESSAGE = "I don’t know based on the available course information."
+
 def rewrite_query(original_query: str, chat_history: list):
     """
     Rewrites a user's query using the LLM for better retrieval,
@@ -62,10 +69,30 @@ def rewrite_query(original_query: str, chat_history: list):
     response = llm.complete(prompt)
     return response.text.strip()
 
-def get_rag_response(query: str, course_id: str = WORKSHEET_NAME, chat_history: list = []):
+def prefetch_contexts(queries: list, course_id: str = WORKSHEET_NAME) -> dict:
+    """
+    Retrieves the context for every query up front: one batched embedding
+    pass and one multi-vector search for the course, instead of one round
+    trip per question. Returns {query: context_chunks}.
+    """
+    queries = [q for q in dict.fromkeys(queries) if q]
+    if not queries or course_id not in COURSE_COLLECTIONS:
+        return {}
+    thresholds = RETRIEVAL_THRESHOLDS.get(course_id, DEFAULT_THRESHOLDS)
+    hits = retrieve_many(
+        client, embed_model, [(course_id, q) for q in queries], COURSE_COLLECTIONS,
+        limit=thresholds["max_k"], output_fields=["context"]
+    )
+    return {
+        q: [hit['entity']['context'] for hit in select_hits(query_hits, thresholds)]
+        for q, query_hits in zip(queries, hits)
+    }
+
+def get_rag_response(query: str, course_id: str = WORKSHEET_NAME, chat_history: list = [], context_chunks: list = None):
     """
     Sends a query to the RAG system and returns the response.
-    Replicates the core logic from app.py.
+    Replicates the core logic from app.py. Pass `context_chunks` from
+    prefetch_contexts to skip the per-question retrieval.
     """
     try:
         current_collection = COURSE_COLLECTIONS.get(course_id)
@@ -75,20 +102,14 @@ def get_rag_response(query: str, course_id: str = WORKSHEET_NAME, chat_history:
         # Rewrite the query for better context retrieval
         # rewritten_query = rewrite_query(query, chat_history) NOT USED
         
-        # Generate a query embedding
-        query_embedding = embed_model.get_query_embedding(query)
-        
-        # Retrieve context from Milvus
-        results = client.search(
-            collection_name=current_collection,
-            data=[query_embedding],
-            anns_field="embedding",  # REQUIRED
-            search_params={'metric_type': 'COSINE', 'params': {'nprobe': 10}},  # REQUIRED
-            output_fields=["context"],
-            limit=5,
-        )
+        # Retrieve context from Milvus (a batch of one unless prefetched)
+        if context_chunks is None:
+            context_chunks = prefetch_contexts([query], course_id).get(query, [])
+
+        # Nothing scored above the course's relevance cutoff: the app answers this without the LLM
+        if not context_chunks:
+            return NO_ANSWER_MESSAGE
 
-        context_chunks = [hit['entity']['context'] for hit in results[0]]
         full_context = "\n".join(context_chunks)
 
         # Build the system prompt
@@ -139,6 +160,20 @@ def main(course_id: str = WORKSHEET_NAME):
             print(f"Error: Missing required column in the sheet. Make sure columns 'Questions', 'Follow-up Question(s)', 'Agent Response', and 'Agent Follow-up response' exist. {e}")
             return
             
+        # Retrieve context for every pending question and follow-up in one batch
+        pending_queries = []
+        for row in data:
+            if str(row['Agent Response']).strip() == '':
+                pending_queries.append(row['Questions'])
+                if row['Follow-up Question(s)'] and str(row['Follow-up Question(s)']).strip().upper() != 'N/A':
+                    pending_queries.append(row['Follow-up Question(s)'])
+        try:
+            contexts = prefetch_contexts(pending_queries, course_id)
+            print(f"Retrieved context for {len(contexts)} questions.")
+        except Exception as e:
+            print(f"Batch retrieval failed, falling back to per-question retrieval: {e}")
+            contexts = {}
+
         # Iterate through each row of the data
         for i, row in enumerate(data):
             try:
@@ -155,7 +190,7 @@ def main(course_id: str = WORKSHEET_NAME):
 
                 # Get the initial response
                 chat_history = []
-                agent_response = get_rag_response(question, course_id, chat_history)
+                agent_response = get_rag_response(question, course_id, chat_history, contexts.get(question))
 
                 # If there's a follow-up, get the next response
                 if follow_up_question and follow_up_question.strip().upper() != 'N/A':
@@ -163,7 +198,7 @@ def main(course_id: str = WORKSHEET_NAME):
                     chat_history.append(ChatMessage(role=MessageRole.USER, content=question))
                     chat_history.append(ChatMessage(role=MessageRole.ASSISTANT, content=agent_response))
                     
-                    follow_up_response = get_rag_response(follow_up_question, course_id, chat_history)
+                    follow_up_response = get_rag_response(follow_up_question, course_id, chat_history, contexts.get(follow_up_question))
                 else:
                     follow_up_response = "N/A"
 
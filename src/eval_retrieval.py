@@ -0,0 +1,296 @@
+import os
+import re
+import json
+import math
+import time
+import argparse
+from collections import Counter
+import numpy as np
+from helper.courses import discover_courses
+from helper.quantize import VECTOR_MODES, search, cosine_scores, top_k
+
+METRICS = ("recall", "mrr", "ndcg")
+MILVUS_PROFILES = {
+    "milvus_flat": ({"index_type": "FLAT"}, {}),
+    "milvus_ivf": ({"index_type": "IVF_FLAT", "params": {"nlist": 128}}, {"nprobe": 16}),
+    "milvus_hnsw": ({"index_type": "HNSW", "params": {"M": 16, "efConstruction": 200}}, {"ef": 64}),
+}
+RRF_K = 60  # Reciprocal rank fusion constant
+
+def load_corpus(embeddings_file: str):
+    with open(embeddings_file, "r", encoding="utf-8") as f:
+        records = [rec for rec in json.load(f) if rec.get("embedding") is not None]
+    texts = [rec.get("text") or rec.get("content") for rec in records]
+    return records, texts, np.asarray([rec["embedding"] for rec in records], dtype=np.float32)
+
+def file_name(path: str) -> str:
+    return re.split(r"[\\/]", path or "")[-1]
+
+def relevant_ids(records: list, expected: list) -> set:
+    """
+    Chunks matching any expected {"source": file name, "heading_path"?}.
+    Deduplicated chunks match through any of the `sources` they stand in for.
+    """
+    ids = set()
+    for i, rec in enumerate(records):
+        metadata = rec.get("metadata", {})
+        sources = {file_name(s) for s in (metadata.get("sources") or [metadata.get("source_path")])}
+        for label in expected:
+            if label["source"] in sources and label.get("heading_path", metadata.get("heading_path")) == metadata.get("heading_path"):
+                ids.add(i)
+    return ids
+
+def load_query_embeddings(questions: list, cache_file: str) -> np.ndarray:
+    """
+    Query embeddings for the questions, computed with the serving embedder on
+    first use and cached in `cache_file` (keyed by model and question text).
+    """
+    from helper.query_embedder import EMBED_MODEL_NAME
+    cache = {}
+    if os.path.exists(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    cached = cache.setdefault(EMBED_MODEL_NAME, {})
+
+    missing = [q for q in dict.fromkeys(questions) if q not in cached]
+    if missing:
+        from helper.query_embedder import load_query_embedder
+        from helper.retrieval import embed_queries
+        print(f"[INFO] Embedding {len(missing)} benchmark questions...")
+        cached.update(zip(missing, embed_queries(load_query_embedder(), missing)))
+        os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+    return np.asarray([cached[q] for q in questions], dtype=np.float32)
+
+class BM25:
+    """Okapi BM25 over the chunk texts (the lexical half of the hybrid backend)."""
+    def __init__(self, texts: list, k1: float = 1.5, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.docs = [Counter(self.tokenize(text)) for text in texts]
+        self.lengths = np.asarray([sum(doc.values()) for doc in self.docs], dtype=np.float32)
+        self.avg_length = float(self.lengths.mean()) if len(self.docs) else 0.0
+        df = Counter(term for doc in self.docs for term in doc)
+        n = len(self.docs)
+        self.idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    @staticmethod
+    def tokenize(text: str) -> list:
+        return re.findall(r"\w+", (text or "").lower())
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / max(self.avg_length, 1e-12))
+        for term in set(self.tokenize(query)):
+            if term not in self.idf:
+                continue
+            tf = np.asarray([doc.get(term, 0) for doc in self.docs], dtype=np.float32)
+            scores += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+def reciprocal_rank_fusion(rankings: list, k: int) -> list:
+    fused = Counter()
+    for ranking in rankings:
+        for rank, idx in enumerate(ranking):
+            fused[int(idx)] += 1.0 / (RRF_K + rank + 1)
+    return [idx for idx, _ in fused.most_common(k)]
+
+def local_backends(texts: list, vectors: np.ndarray, depth: int) -> dict:
+    """
+    {name: search(query_vector, query_text, k) -> ranked chunk ids} for the
+    in-process backends: exact float32, each compressed mode, BM25 and a
+    BM25 + dense hybrid fused with reciprocal rank fusion.
+    """
+    bm25 = BM25(texts)
+
+    def dense(mode):
+        return lambda vector, text, k: list(search(vector[None, :], vectors, k, mode=mode)[0])
+
+    def lexical(vector, text, k):
+        return list(top_k(bm25.scores(text)[None, :], min(k, len(texts)))[0])
+
+    def hybrid(vector, text, k):
+        dense_ids = top_k(cosine_scores(vector[None, :], vectors), min(depth, len(texts)))[0]
+        return reciprocal_rank_fusion([dense_ids, lexical(vector, text, depth)], k)
+
+    backends = {"exact": dense("float32")}
+    backends.update({mode: dense(mode) for mode in VECTOR_MODES if mode != "float32"})
+    backends.update({"bm25": lexical, "hybrid": hybrid})
+    return backends
+
+def milvus_backend(client, course_id: str, vectors: np.ndarray, profile: str):
+    """
+    Loads the vectors into a temporary collection indexed with `profile` and
+    returns (search function, cleanup function).
+    """
+    from pymilvus import DataType
+
+    index, search_params = MILVUS_PROFILES[profile]
+    name = f"BENCH_{course_id}_{profile}"
+    if client.has_collection(name):
+        client.drop_collection(name)
+
+    schema = client.create_schema(auto_id=False, enable_dynamic_field=False)
+    schema.add_field("id", DataType.INT64, is_primary=True)
+    schema.add_field("embedding", DataType.FLOAT_VECTOR, dim=vectors.shape[1])
+    index_params = client.prepare_index_params()
+    index_params.add_index(field_name="embedding", metric_type="COSINE", **index)
+    client.create_collection(collection_name=name, schema=schema, index_params=index_params)
+    client.insert(collection_name=name, data=[{"id": i, "embedding": v.tolist()} for i, v in enumerate(vectors)])
+    client.flush(name)
+    client.load_collection(name)
+
+    def run(vector, text, k):
+        hits = client.search(
+            collection_name=name, data=[vector.tolist()], anns_field="embedding", limit=k,
+            search_params={"metric_type": "COSINE", "params": search_params},
+        )[0]
+        return [hit["id"] for hit in hits]
+
+    return run, lambda: client.drop_collection(name)
+
+def score_ranking(ranking: list, relevant: set, k: int) -> dict:
+    ranking = list(ranking)[:k]
+    hits = [idx in relevant for idx in ranking]
+    first = next((rank for rank, hit in enumerate(hits) if hit), None)
+    dcg = sum(1 / math.log2(rank + 2) for rank, hit in enumerate(hits) if hit)
+    ideal = sum(1 / math.log2(rank + 2) for rank in range(min(len(relevant), k)))
+    return {
+        "recall": sum(hits) / len(relevant) if relevant else 0.0,
+        "mrr": 0.0 if first is None else 1 / (first + 1),
+        "ndcg": dcg / ideal if ideal else 0.0,
+    }
+
+def benchmark(backend, queries: np.ndarray, questions: list, relevant: list, k: int, repeat: int) -> dict:
+    """
+    Mean recall@k, MRR@k and nDCG@k, plus queries/sec answering one query at
+    a time. QPS comes from the fastest of `repeat` passes, which is far less
+    noisy than the mean on a shared machine.
+    """
+    rankings = [backend(vector, question, k) for vector, question in zip(queries, questions)]  # also warms up
+    scores = [score_ranking(ranking, rel, k) for ranking, rel in zip(rankings, relevant)]
+    fastest = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for vector, question in zip(queries, questions):
+            backend(vector, question, k)
+        fastest = min(fastest, time.perf_counter() - started)
+    result = {metric: float(np.mean([s[metric] for s in scores])) for metric in METRICS}
+    result["qps"] = len(questions) / max(fastest, 1e-9)
+    return result
+
+def find_regressions(results: dict, baseline: dict, max_quality_drop: float, max_qps_drop: float,
+                     skipped: set = frozenset()) -> list:
+    """
+    Metrics that fell more than `max_quality_drop` (absolute) or QPS more
+    than `max_qps_drop` (relative). Baseline courses and backends missing
+    from `results` are regressions too, except backends in `skipped` (left
+    out on purpose with --backends, or Milvus profiles without --milvus-uri).
+    """
+    regressions = []
+    for course_id, backends in baseline.items():
+        for name in backends:
+            if name not in skipped and name not in results.get(course_id, {}):
+                regressions.append(f"{course_id}/{name} is in the baseline but was not benchmarked")
+    for course_id, backends in results.items():
+        for name, current in backends.items():
+            reference = baseline.get(course_id, {}).get(name)
+            if not reference:
+                continue
+            for metric in METRICS:
+                if current[metric] < reference[metric] - max_quality_drop:
+                    regressions.append(f"{course_id}/{name} {metric} {current[metric]:.3f} < baseline {reference[metric]:.3f}")
+            if current["qps"] < reference["qps"] * (1 - max_qps_drop):
+                regressions.append(f"{course_id}/{name} qps {current['qps']:,.0f} < baseline {reference['qps']:,.0f}")
+    return regressions
+
+if __name__ == "__main__":
+    this_dir = os.path.dirname(__file__)
+    root_dir = os.path.abspath(os.path.join(this_dir, ".."))
+    data_dir = os.path.join(root_dir, "data")
+
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmark: quality and throughput per backend.")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed passes over the questions per backend")
+    parser.add_argument("--backends", nargs="*", default=None, help="Only run these backends (default: all local ones)")
+    parser.add_argument("--milvus-uri", default=None, help="Also benchmark Milvus index profiles on this instance")
+    parser.add_argument("--questions", default=os.path.join(data_dir, "retrieval_questions.json"))
+    parser.add_argument("--query-cache", default=os.path.join(data_dir, "retrieval_query_embeddings.json"))
+    parser.add_argument("--baseline", default=os.path.join(data_dir, "retrieval_baseline.json"))
+    parser.add_argument("--update-baseline", action="store_true", help="Save these results as the new baseline")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="Don't fail when there is no baseline yet (first run)")
+    parser.add_argument("--max-quality-drop", type=float, default=0.02, help="Allowed absolute drop in recall/MRR/nDCG")
+    parser.add_argument("--max-qps-drop", type=float, default=0.3, help="Allowed relative drop in queries/sec")
+    args = parser.parse_args()
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        labelled = json.load(f)
+
+    client = None
+    if args.milvus_uri:
+        from pymilvus import MilvusClient
+        client = MilvusClient(uri=args.milvus_uri)
+
+    results = {}
+    skipped = set()
+    if client is None:
+        skipped.update(MILVUS_PROFILES)
+    for course_id in discover_courses(os.path.join(root_dir, "pdfs")):
+        embeddings_file = os.path.join(data_dir, f"{course_id}_embeddings.json")
+        if not os.path.exists(embeddings_file) or not labelled.get(course_id):
+            print(f"[WARN] No embeddings or labelled questions for {course_id}. Skipping...")
+            continue
+
+        records, texts, vectors = load_corpus(embeddings_file)
+        items = [(item["question"], relevant_ids(records, item["expected"])) for item in labelled[course_id] if item["expected"]]
+        unmatched = [question for question, rel in items if not rel]
+        if unmatched:
+            # Kept as misses: a chunking change that loses the labelled text must lower the scores
+            print(f"[WARN] {course_id}: {len(unmatched)} questions match no chunk and count as misses: {unmatched}")
+        if not items:
+            continue
+        questions = [question for question, _ in items]
+        relevant = [rel for _, rel in items]
+        queries = load_query_embeddings(questions, args.query_cache)
+
+        backends = local_backends(texts, vectors, depth=max(4 * args.k, 20))
+        cleanups = []
+        if client is not None:
+            for profile in MILVUS_PROFILES:
+                backends[profile], cleanup = milvus_backend(client, course_id, vectors, profile)
+                cleanups.append(cleanup)
+
+        print(f"[INFO] {course_id}: {len(questions)} questions over {len(vectors)} chunks (k={args.k})")
+        results[course_id] = {}
+        try:
+            for name, backend in backends.items():
+                if args.backends and name not in args.backends:
+                    skipped.add(name)
+                    continue
+                result = benchmark(backend, queries, questions, relevant, args.k, args.repeat)
+                results[course_id][name] = result
+                print(f"    {name:<12} recall@{args.k}={result['recall']:.3f}  mrr={result['mrr']:.3f}  "
+                      f"ndcg={result['ndcg']:.3f}  qps={result['qps']:,.0f}")
+        finally:
+            for cleanup in cleanups:
+                cleanup()
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"[INFO] Saved baseline → {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.max_quality_drop, args.max_qps_drop, skipped)
+        if regressions:
+            for regression in regressions:
+                print(f"[ERROR] Regression: {regression}")
+            raise SystemExit(1)
+        print("[INFO] No regressions against the baseline")
+    elif args.allow_missing_baseline:
+        print(f"[WARN] No baseline at {args.baseline}. Run with --update-baseline to create one.")
+    else:
+        print(f"[ERROR] No baseline at {args.baseline}. Run with --update-baseline to create one.")
+        raise SystemExit(1)
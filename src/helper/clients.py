@@ -0,0 +1,268 @@
+import os
+import time
+import random
+import threading
+import requests
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from pymilvus import MilvusClient
+
+# --- Configuration (docker-compose sets MILVUS_URI and OLLAMA_HOST for the app container) ---
+MILVUS_URI = os.getenv("MILVUS_URI", "http://localhost:19530")
+MILVUS_TIMEOUT = float(os.getenv("MILVUS_TIMEOUT", "10"))
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "16"))
+
+class ServiceUnavailable(Exception):
+    """Raised instead of calling a backend whose circuit breaker is open, or after retries run out."""
+
+class TransientError(Exception):
+    """Wraps a backend error that is worth retrying (connection lost, server unavailable, deadline exceeded)."""
+
+def is_transient_status(status_code: int) -> bool:
+    """HTTP statuses worth retrying: server errors and rate limiting."""
+    return status_code >= 500 or status_code == 429
+
+# gRPC status codes (as reported by pymilvus and grpc errors) that mean Milvus is unreachable or overloaded
+TRANSIENT_MILVUS_CODES = {"UNAVAILABLE", "DEADLINE_EXCEEDED"}
+
+def is_transient_milvus_error(e: Exception) -> bool:
+    """
+    True for errors a retry on a fresh connection can fix. Anything else
+    (bad filter, missing collection, schema mismatch) fails the same way
+    every time.
+    """
+    if isinstance(e, (ConnectionError, TimeoutError)) or type(e).__name__ == "MilvusUnavailableException":
+        return True
+    code = getattr(e, "code", None)
+    code = code() if callable(code) else code
+    if getattr(code, "name", code) in TRANSIENT_MILVUS_CODES:
+        return True
+    return "fail connecting to server" in str(e).lower()
+
+def with_retries(fn, attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0, retry_on=(Exception,)):
+    """
+    Calls `fn` up to `attempts` times, sleeping with full-jitter exponential
+    backoff (random between 0 and base_delay * 2^n, capped at max_delay) between tries.
+    """
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except retry_on:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * (2 ** attempt))))
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and fails fast for
+    `reset_timeout` seconds. After that one trial call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def _before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_running:
+                raise ServiceUnavailable(f"{self.name} is unavailable (circuit open)")
+            self._trial_running = True
+
+    def _record(self, success: bool):
+        with self._lock:
+            self._trial_running = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.opened_at is not None or self.failures >= self.failure_threshold:
+                    self.opened_at = time.monotonic()
+
+    def call(self, fn, failures=(Exception,)):
+        """
+        Runs `fn` through the breaker. Only exceptions in `failures` count
+        towards opening it; others are re-raised as answered calls (the
+        backend responded, the request itself was wrong).
+        """
+        self._before_call()
+        try:
+            result = fn()
+        except failures:
+            self._record(success=False)
+            raise
+        except Exception:
+            self._record(success=True)
+            raise
+        self._record(success=True)
+        return result
+
+class ResilientMilvus:
+    """
+    One shared MilvusClient (its gRPC channel multiplexes concurrent calls)
+    wrapped with retries and a circuit breaker. Only transient errors (see
+    is_transient_milvus_error) are retried, recreate the client, so the app
+    reconnects on its own after a Milvus restart, and count towards the
+    breaker; other errors are raised unchanged on the first attempt.
+    Exposes the MilvusClient methods used by the app (search, get, query, ...).
+    """
+    def __init__(self, uri: str = MILVUS_URI, timeout: float = MILVUS_TIMEOUT, attempts: int = 3):
+        self.uri = uri
+        self.timeout = timeout
+        self.attempts = attempts
+        self.breaker = CircuitBreaker("Milvus")
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self) -> MilvusClient:
+        with self._lock:
+            if self._client is None:
+                self._client = MilvusClient(uri=self.uri, timeout=self.timeout)
+            return self._client
+
+    def _reset_client(self):
+        with self._lock:
+            if self._client is not None:
+                try:
+                    self._client.close()
+                except Exception:
+                    pass
+            self._client = None
+
+    def _call(self, method: str, *args, **kwargs):
+        def attempt():
+            try:
+                return getattr(self._get_client(), method)(*args, timeout=self.timeout, **kwargs)
+            except Exception as e:
+                if not is_transient_milvus_error(e):
+                    raise
+                self._reset_client()
+                raise TransientError(e) from e
+        try:
+            return self.breaker.call(
+                lambda: with_retries(attempt, attempts=self.attempts, retry_on=(TransientError,)),
+                failures=(TransientError,),
+            )
+        except TransientError as e:
+            raise ServiceUnavailable(f"Milvus request failed: {e.__cause__}") from e.__cause__
+
+    def search(self, *args, **kwargs):
+        return self._call("search", *args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return self._call("get", *args, **kwargs)
+
+    def query(self, *args, **kwargs):
+        return self._call("query", *args, **kwargs)
+
+    def describe_collection(self, *args, **kwargs):
+        return self._call("describe_collection", *args, **kwargs)
+
+    def has_collection(self, *args, **kwargs):
+        return self._call("has_collection", *args, **kwargs)
+
+    def is_ready(self) -> bool:
+        """Readiness probe: Milvus answers a cheap metadata call."""
+        try:
+            self._get_client().list_collections(timeout=self.timeout)
+            return True
+        except Exception:
+            self._reset_client()
+            return False
+
+class OllamaChat:
+    """
+    Minimal Ollama chat client over a pooled HTTP session, with retries,
+    a circuit breaker and a bounded request timeout. Messages are plain
+    {"role": ..., "content": ...} dicts; `chat` returns the reply text.
+    """
+    def __init__(self, host: str = OLLAMA_HOST, model: str = OLLAMA_MODEL, timeout: float = OLLAMA_TIMEOUT,
+                 pool_size: int = OLLAMA_POOL_SIZE, attempts: int = 2):
+        self.host = host.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.attempts = attempts
+        self.breaker = CircuitBreaker("Ollama", failure_threshold=3)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def chat(self, messages: list, options: dict = None, format: str = None) -> str:
+        payload = {"model": self.model, "messages": messages, "stream": False}
+        if options:
+            payload["options"] = options
+        if format:
+            payload["format"] = format  # e.g. "json" to constrain the reply to valid JSON
+
+        def attempt():
+            try:
+                response = self.session.post(f"{self.host}/api/chat", json=payload, timeout=(5, self.timeout))
+                response.raise_for_status()
+            except requests.exceptions.ConnectionError as e:
+                raise TransientError(e) from e
+            except requests.exceptions.HTTPError as e:
+                if is_transient_status(e.response.status_code):
+                    raise TransientError(e) from e
+                raise
+            return response.json()["message"]["content"]
+
+        try:
+            # Connection problems, 5xx and 429 are retried; a timed-out generation would just time out
+            # again, so it only counts towards the breaker. Client errors (bad request, unknown model,
+            # malformed reply) are raised unchanged without tripping it.
+            return self.breaker.call(
+                lambda: with_retries(attempt, attempts=self.attempts, retry_on=(TransientError,)),
+                failures=(TransientError, requests.exceptions.Timeout),
+            )
+        except TransientError as e:
+            raise ServiceUnavailable(f"Ollama request failed: {e.__cause__}") from e.__cause__
+        except requests.exceptions.Timeout as e:
+            raise ServiceUnavailable(f"Ollama request failed: {e}") from e
+
+    def is_ready(self) -> bool:
+        """Readiness probe: Ollama is up and the model has been pulled."""
+        try:
+            response = self.session.get(f"{self.host}/api/tags", timeout=5)
+            response.raise_for_status()
+            names = {m.get("name", "").split(":")[0] for m in response.json().get("models", [])}
+            return self.model.split(":")[0] in names
+        except (requests.exceptions.RequestException, ValueError):
+            return False
+
+class LRUCache:
+    """Thread-safe LRU (the app keeps recent answers and per-session search results in these)."""
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
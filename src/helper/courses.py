@@ -0,0 +1,27 @@
+import os
+import re
+
+def discover_courses(pdfs_dir: str) -> list:
+    """Course IDs are the sub-directories of `pdfs/` (e.g. pdfs/f21ca → F21CA)."""
+    if not os.path.isdir(pdfs_dir):
+        return []
+    return sorted(
+        name.upper() for name in os.listdir(pdfs_dir)
+        if os.path.isdir(os.path.join(pdfs_dir, name))
+    )
+
+def collection_name(course_id: str) -> str:
+    return f"HWU_MACS_{course_id}"
+
+def doc_type_from_path(source_path: str) -> str:
+    """
+    Document type from the course file naming scheme, e.g.
+    pdfs/f21ca/f21CA-course_team.pdf → "course_team". URLs are "site".
+    """
+    if not source_path:
+        return "unknown"
+    if source_path.startswith(("http://", "https://")):
+        return "site"
+    filename = re.split(r"[\\/]", source_path)[-1]
+    stem = os.path.splitext(filename)[0]
+    return stem.split("-", 1)[1].lower() if "-" in stem else stem.lower()
@@ -0,0 +1,115 @@
+import re
+import hashlib
+import numpy as np
+from collections import defaultdict
+from typing import List, Dict, Any
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+def shingles(text: str, k: int = 5) -> set:
+    """Word k-gram shingles of the normalised text (case, whitespace and markdown punctuation ignored)."""
+    words = re.sub(r'[^\w\s]', ' ', text.lower()).split()
+    if not words:
+        return set()
+    if len(words) <= k:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+class MinHasher:
+    """MinHash signatures using `num_perm` universal hash functions over 32-bit shingle hashes."""
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, MAX_HASH, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set: set) -> np.ndarray:
+        hashes = np.array(
+            [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little") for s in shingle_set],
+            dtype=np.uint64,
+        )
+        # (a*x + b) mod p, then keep the low 32 bits; a, x < 2^32 so a*x fits in uint64
+        permuted = ((np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME) & MAX_HASH
+        return permuted.min(axis=0)
+
+def lsh_candidates(signatures: List[np.ndarray], bands: int) -> set:
+    """
+    Banded LSH: items sharing a band bucket become candidate pairs. Each
+    bucket only pairs its members with the bucket's first member, so even
+    a large cluster of identical boilerplate costs O(n * bands) pairs
+    rather than comparing every pair.
+    """
+    rows = len(signatures[0]) // bands
+    pairs = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        for idx, sig in enumerate(signatures):
+            buckets[sig[band * rows:(band + 1) * rows].tobytes()].append(idx)
+        for members in buckets.values():
+            for other in members[1:]:
+                pairs.add((members[0], other))
+    return pairs
+
+def cluster_near_duplicates(texts: List[str], threshold: float = 0.8, num_perm: int = 128,
+                            bands: int = 16, shingle_size: int = 5) -> List[List[int]]:
+    """
+    Groups texts whose estimated Jaccard similarity is at least `threshold`.
+    Returns clusters as lists of indices into `texts` (singletons included).
+    """
+    hasher = MinHasher(num_perm=num_perm)
+    shingle_sets = [shingles(text, k=shingle_size) for text in texts]
+    indexed = [i for i, s in enumerate(shingle_sets) if s]
+
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    if indexed:
+        signatures = [hasher.signature(shingle_sets[i]) for i in indexed]
+        for a, b in lsh_candidates(signatures, bands):
+            # Verify candidates against the signature estimate to drop LSH false positives
+            similarity = float(np.mean(signatures[a] == signatures[b]))
+            if similarity >= threshold:
+                parent[find(indexed[a])] = find(indexed[b])
+
+    clusters = defaultdict(list)
+    for i in range(len(texts)):
+        clusters[find(i)].append(i)
+    return sorted(clusters.values(), key=lambda members: members[0])
+
+def dedup_records(records: List[Dict[str, Any]], **cluster_kwargs) -> List[Dict[str, Any]]:
+    """
+    Collapses near-duplicate ingest records into one canonical record per
+    cluster and course. The canonical record is the longest member; its
+    metadata gains `sources` (every source_path it stands in for) and
+    `duplicate_count`. Records from different courses are clustered
+    together but never merged, since each course has its own collection.
+    """
+    texts = [rec.get("text") or rec.get("content") or "" for rec in records]
+    clusters = cluster_near_duplicates(texts, **cluster_kwargs)
+
+    deduped = []
+    for members in clusters:
+        by_course = defaultdict(list)
+        for idx in members:
+            by_course[records[idx]["metadata"].get("course_id")].append(idx)
+
+        for course_members in by_course.values():
+            canonical_idx = max(course_members, key=lambda idx: (len(texts[idx]), -idx))
+            canonical = {**records[canonical_idx], "metadata": dict(records[canonical_idx]["metadata"])}
+            sources = []
+            for idx in course_members:
+                source = records[idx]["metadata"].get("source_path")
+                if source and source not in sources:
+                    sources.append(source)
+            canonical["metadata"]["sources"] = sources
+            canonical["metadata"]["duplicate_count"] = len(course_members)
+            deduped.append((canonical_idx, canonical))
+
+    # Keep the original document order
+    return [rec for _, rec in sorted(deduped, key=lambda item: item[0])]
@@ -0,0 +1,133 @@
+import os
+import json
+import hashlib
+import numpy as np
+from helper.courses import doc_type_from_path
+from helper.clients import ServiceUnavailable
+
+# Course files that answer the common logistics questions (deadlines, lecturers, weighting, timetable)
+FAQ_DOC_TYPES = ("course_team", "assessment", "course_assessment_overview", "timetable", "schedule")
+FAQ_THRESHOLD = 0.9  # Minimum cosine similarity for a stored question to answer a query directly
+
+GENERATE_PROMPT = (
+    "You write the FAQ for a university course. From the course document excerpt below, "
+    "write up to {max_pairs} questions students commonly ask (e.g. deadlines, lecturers and contact details, "
+    "assessment weighting, timetable) together with their answers. Use ONLY facts stated in the excerpt "
+    "and skip anything it does not answer. For every question also give two other ways a student might ask it.\n"
+    'Reply with JSON only: {{"pairs": [{{"questions": ["...", "...", "..."], "answer": "..."}}]}}\n\n'
+    "Course: {course_id}\n"
+    "Excerpt:\n{text}"
+)
+
+def faq_sources(docs_dir: str) -> list:
+    """The PDFs of a course that FAQ entries are generated from."""
+    if not os.path.isdir(docs_dir):
+        return []
+    return sorted(
+        os.path.join(docs_dir, name) for name in os.listdir(docs_dir)
+        if name.endswith(".pdf") and doc_type_from_path(name) in FAQ_DOC_TYPES
+    )
+
+def file_digests(paths: list) -> dict:
+    """{file name: sha256 of its content} for the files that exist."""
+    digests = {}
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                digests[os.path.basename(path)] = hashlib.sha256(f.read()).hexdigest()
+    return digests
+
+def normalise_entry(entry: dict, origin: str, source: str = "") -> dict:
+    """
+    Accepts {"question": ...} or {"questions": [...]} plus "answer"; returns
+    an entry with a de-duplicated `questions` list, or None if it is unusable.
+    """
+    questions = entry.get("questions") or [entry.get("question")]
+    questions = list(dict.fromkeys(q.strip() for q in questions if isinstance(q, str) and q.strip()))
+    answer = entry.get("answer")
+    if not questions or not isinstance(answer, str) or not answer.strip():
+        return None
+    return {"questions": questions, "answer": answer.strip(), "source": entry.get("source", source), "origin": origin}
+
+def load_curated(path: str) -> list:
+    """Hand-written pairs: a JSON list of {"question" | "questions", "answer", "source"?}."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        entries = [normalise_entry(entry, "curated") for entry in json.load(f)]
+    return [entry for entry in entries if entry]
+
+def generate_pairs(llm, course_id: str, records: list, max_pairs: int = 5):
+    """
+    Asks the LLM (a helper.clients.OllamaChat) for question→answer pairs for
+    every chunk that comes from one of the FAQ_DOC_TYPES files. Chunks with
+    an unreadable reply are skipped; chunks the LLM could not be reached for
+    (timeout, open circuit) are skipped and counted.
+    Returns (entries, number of unreachable chunks).
+    """
+    entries, failed = [], 0
+    for rec in records:
+        metadata = rec.get("metadata", {})
+        source_path = metadata.get("source_path", "")
+        if (metadata.get("doc_type") or doc_type_from_path(source_path)) not in FAQ_DOC_TYPES:
+            continue
+        text = rec["text"] if "text" in rec else rec["content"]
+        prompt = GENERATE_PROMPT.format(max_pairs=max_pairs, course_id=course_id, text=text)
+        try:
+            reply = json.loads(llm.chat([{"role": "user", "content": prompt}], options={"temperature": 0}, format="json"))
+        except ValueError as e:
+            print(f"[WARN] Unreadable FAQ reply for a chunk of {source_path}: {e}")
+            continue
+        except ServiceUnavailable as e:
+            print(f"[WARN] No FAQ reply for a chunk of {source_path}: {e}")
+            failed += 1
+            continue
+        source = metadata.get("heading_path") or os.path.basename(source_path.replace("\\", "/"))
+        for pair in reply.get("pairs", [])[:max_pairs] if isinstance(reply, dict) else []:
+            entry = normalise_entry(pair, "generated", source=source) if isinstance(pair, dict) else None
+            if entry:
+                entries.append(entry)
+    return entries, failed
+
+def merge_entries(curated: list, generated: list) -> list:
+    """Curated entries win: generated entries sharing any question with them are dropped."""
+    taken = {q.lower() for entry in curated for q in entry["questions"]}
+    merged = list(curated)
+    for entry in generated:
+        if not any(q.lower() in taken for q in entry["questions"]):
+            merged.append(entry)
+            taken.update(q.lower() for q in entry["questions"])
+    return merged
+
+class FaqIndex:
+    """
+    In-memory index over the embedded questions of one course's FAQ file
+    (see 2b_build_faq.py). Every phrasing of a question is a row of the
+    matrix, so a query only has to be close to one of them.
+    """
+    def __init__(self, entries: list):
+        self.entries = entries
+        rows, vectors = [], []
+        for i, entry in enumerate(entries):
+            for embedding in entry.get("embeddings", []):
+                rows.append(i)
+                vectors.append(embedding)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors):
+            self.vectors /= np.maximum(np.linalg.norm(self.vectors, axis=1, keepdims=True), 1e-12)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f).get("entries", []))
+
+    def match(self, query_embed, threshold: float = FAQ_THRESHOLD):
+        """Best entry and its score if the closest question scores at least `threshold`, else (None, score)."""
+        if not len(self.rows):
+            return None, 0.0
+        query = np.asarray(query_embed, dtype=np.float32)
+        scores = self.vectors @ (query / max(np.linalg.norm(query), 1e-12))
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        return (self.entries[self.rows[best]] if score >= threshold else None), score
@@ -3,23 +3,72 @@ from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 import re
 
-def fetch_html_content(url):
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+def fetch_html_content(url, session=None):
     """Fetches the HTML Content from a given URL with a user-agent to mimic a browser"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    http = session or requests
     try:
-        response = requests.get(url, headers=headers)
+        response = http.get(url, headers=DEFAULT_HEADERS, timeout=30)
         response.raise_for_status()
         return response.text
     except requests.exceptions.RequestException as e:
         print(f"Error fetching {url}: {e}")
         return None
 
-def extract_text_from_html(html_content, base_url):
+def embedded_export_url(src, base_url):
+    """
+    Maps an iframe src to the export URL of the embedded Google Doc/Sheet.
+    Returns (kind, export_url), or (None, absolute_url) for any other embed.
+    """
+    absolute_url = urljoin(base_url, src)
+
+    # Handle embedded Google Docs
+    if "docs.google.com/document" in src:
+        match = re.search(r'/d/e/(.*?)/', absolute_url)
+        if match:
+            doc_id = match.group(1)
+            return "document", f"https://docs.google.com/document/d/e/{doc_id}/export?format=html"
+        return "document", None
+
+    # Handle embedded Google Sheets
+    if "docs.google.com/spreadsheets" in src:
+        match = re.search(r'/d/e/([a-zA-Z0-9-_]+)', absolute_url)
+        if match:
+            sheet_id = match.group(1)
+            return "spreadsheet", f"https://docs.google.com/spreadsheets/d/e/{sheet_id}/pub?output=csv"
+        return "spreadsheet", None
+
+    return None, absolute_url
+
+def find_embedded_exports(html_content, base_url):
+    """Lists the export URLs of every embedded Google Doc/Sheet in a page, in page order."""
+    if not html_content:
+        return []
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    main_content_div = soup.find('div', class_='f32l6')
+    if not main_content_div:
+        return []
+
+    export_urls = []
+    for iframe in main_content_div.find_all('iframe'):
+        src = iframe.get('src')
+        if not src:
+            continue
+        kind, export_url = embedded_export_url(src, base_url)
+        if kind and export_url:
+            export_urls.append(export_url)
+    return export_urls
+
+def extract_text_from_html(html_content, base_url, fetch=fetch_html_content):
     """
     Parses HTML and extracts clean text from all visible elements,
     including content from common Google Sites blocks and embedded media.
+    `fetch` is called for every embedded Google Doc/Sheet export URL; pass a
+    lookup into prefetched content to avoid one blocking request per iframe.
     """
     if not html_content:
         return ""
@@ -41,33 +90,25 @@ def extract_text_from_html(html_content, base_url):
             if not src:
                 continue
 
-            absolute_url = urljoin(base_url, src)
+            kind, export_url = embedded_export_url(src, base_url)
 
-            # Handle embedded Google Docs
-            if "docs.google.com/document" in src:
-                match = re.search(r'/d/e/(.*?)/', absolute_url)
-                if match:
-                    doc_id = match.group(1)
-                    export_url = f"https://docs.google.com/document/d/e/{doc_id}/export?format=html"
-                    embedded_html = fetch_html_content(export_url)
+            if kind == "document":
+                if export_url:
+                    embedded_html = fetch(export_url)
                     if embedded_html:
                         embedded_soup = BeautifulSoup(embedded_html, 'html.parser')
                         extracted_texts.append(embedded_soup.get_text(separator=' ', strip=True))
 
-            # Handle embedded Google Sheets
-            elif "docs.google.com/spreadsheets" in src:
-                match = re.search(r'/d/e/([a-zA-Z0-9-_]+)', absolute_url)
-                if match:
-                    sheet_id = match.group(1)
-                    export_url = f"https://docs.google.com/spreadsheets/d/e/{sheet_id}/pub?output=csv"
-                    csv_data = fetch_html_content(export_url)
+            elif kind == "spreadsheet":
+                if export_url:
+                    csv_data = fetch(export_url)
                     if csv_data:
                         rows = csv_data.splitlines()
                         for row in rows:
                             extracted_texts.append(row)
 
             else:
-                extracted_texts.append(f"Embedded content detected. Source URL: {absolute_url}")
+                extracted_texts.append(f"Embedded content detected. Source URL: {export_url}")
 
 
         images = main_content_div.find_all('img')
@@ -79,7 +120,8 @@ def extract_text_from_html(html_content, base_url):
             if title:
                 extracted_texts.append(f"Image title: {title}")
     else:
-        extracted_texts.append(soup.body.get_text(separator=' ', strip=True))
+        body = soup.body or soup
+        extracted_texts.append(body.get_text(separator=' ', strip=True))
 
     return ' '.join(extracted_texts)
 
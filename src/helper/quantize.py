@@ -0,0 +1,107 @@
+import json
+import os
+import numpy as np
+
+# Storage modes for embeddings, from largest to smallest
+VECTOR_MODES = ("float32", "float16", "int8", "binary")
+# Stored bytes per dimension. Binary collections keep float16 vectors for rescoring next to the bits.
+BYTES_PER_DIM = {"float32": 4, "float16": 2, "int8": 1, "binary": 2 + 1 / 8}
+
+def normalise(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def to_float16(vectors) -> np.ndarray:
+    return np.asarray(vectors, dtype=np.float16)
+
+def to_sq8(vectors):
+    """
+    8-bit scalar quantisation as Milvus IVF_SQ8 does it: every dimension is
+    mapped onto 256 levels between its own min and max over the collection.
+    Returns (codes, per-dimension min, per-dimension step).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    low = vectors.min(axis=0)
+    step = np.maximum(vectors.max(axis=0) - low, 1e-12) / 255.0
+    codes = np.clip(np.rint((vectors - low) / step), 0, 255).astype(np.uint8)
+    return codes, low, step
+
+def from_sq8(codes, low, step) -> np.ndarray:
+    return np.asarray(codes, dtype=np.float32) * step + low
+
+def to_binary(vectors) -> np.ndarray:
+    """Sign bits packed 8 per byte (dim / 8 bytes per vector)."""
+    return np.packbits(np.asarray(vectors) > 0, axis=-1)
+
+def compress(vectors, mode: str) -> np.ndarray:
+    if mode == "float32":
+        return np.asarray(vectors, dtype=np.float32)
+    if mode == "float16":
+        return to_float16(vectors)
+    if mode == "int8":
+        return to_sq8(vectors)[0]
+    if mode == "binary":
+        return to_binary(vectors)
+    raise ValueError(f"Unknown vector mode '{mode}', expected one of {VECTOR_MODES}")
+
+def cosine_scores(queries, vectors) -> np.ndarray:
+    return normalise(queries) @ normalise(vectors).T
+
+def hamming_distances(query_bits, vector_bits) -> np.ndarray:
+    xor = np.bitwise_xor(query_bits[:, None, :], vector_bits[None, :, :])
+    return np.unpackbits(xor, axis=-1).sum(axis=-1)
+
+def top_k(scores: np.ndarray, k: int, largest: bool = True) -> np.ndarray:
+    order = np.argsort(-scores if largest else scores, axis=-1, kind="stable")
+    return order[:, :k]
+
+def search(queries, vectors, k: int, mode: str = "float32", rescore_candidates: int = None) -> np.ndarray:
+    """
+    Top-k ids per query against vectors stored in `mode`. Queries stay in
+    float32, as in Milvus. Binary mode ranks by Hamming distance, then
+    rescores the best `rescore_candidates` (default 4 * k) with
+    full-precision cosine.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    k = min(k, len(vectors))
+
+    if mode == "int8":
+        return top_k(cosine_scores(queries, from_sq8(*to_sq8(vectors))), k)
+    if mode != "binary":
+        stored = compress(vectors, mode).astype(np.float32)
+        return top_k(cosine_scores(queries, stored), k)
+
+    candidates = top_k(hamming_distances(to_binary(queries), to_binary(vectors)), min(rescore_candidates or 4 * k, len(vectors)), largest=False)
+    results = []
+    for query, ids in zip(queries, candidates):
+        scores = cosine_scores(query[None, :], vectors[ids])[0]
+        results.append(ids[np.argsort(-scores, kind="stable")[:k]])
+    return np.array(results)
+
+def recall_at_k(reference: np.ndarray, candidates: np.ndarray) -> float:
+    """Mean fraction of the reference top-k found in the candidate top-k."""
+    hits = [len(set(ref) & set(cand)) / len(ref) for ref, cand in zip(reference, candidates)]
+    return float(np.mean(hits)) if hits else 0.0
+
+def save_compressed(vectors, output_file: str, mode: str):
+    """
+    Writes the compressed vectors as an .npz artefact next to the JSON
+    embeddings. int8 artefacts also carry the per-dimension `low` and `step`
+    needed to decode the codes.
+    """
+    extra = {}
+    if mode == "int8":
+        codes, low, step = to_sq8(vectors)
+        extra = {"low": low, "step": step}
+    else:
+        codes = compress(vectors, mode)
+    np.savez_compressed(output_file, vectors=codes, mode=mode, dim=np.asarray(vectors).shape[-1], **extra)
+
+def load_vector_modes(path: str) -> dict:
+    """Per-course vector mode chosen with eval_quantization.py ({course_id: mode})."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
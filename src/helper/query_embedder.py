@@ -0,0 +1,95 @@
+import os
+import numpy as np
+
+# Everything heavy (onnxruntime, tokenizers, llama_index → torch/transformers) is imported
+# inside the functions below, so importing this module costs next to nothing.
+
+EMBED_MODEL_NAME = "BAAI/bge-small-en-v1.5"
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "onnx")  # onnx | huggingface
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "./hf_cache")
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))  # 0 lets onnxruntime decide
+
+# The instruction llama_index's HuggingFaceEmbedding prepends to BGE queries by default
+BGE_QUERY_INSTRUCTION = "Represent this question for searching relevant passages: "
+
+def query_instruction(embed_model) -> str:
+    """Text prepended to queries (not documents) before embedding, as get_query_embedding does."""
+    instruction = getattr(embed_model, "query_instruction", None)
+    if instruction is not None:
+        return instruction
+    return BGE_QUERY_INSTRUCTION if "bge-" in getattr(embed_model, "model_name", "").lower() else ""
+
+class OnnxQueryEmbedder:
+    """
+    BGE embeddings with onnxruntime and a `tokenizers` tokenizer instead of
+    torch + sentence-transformers: CLS pooling and L2 normalisation, as the
+    sentence-transformers config of the BGE models does. Exposes the
+    llama_index embedding methods the app uses, so it is a drop-in for
+    HuggingFaceEmbedding on the query path.
+    """
+    def __init__(self, model_name: str = EMBED_MODEL_NAME, cache_dir: str = EMBED_CACHE_DIR,
+                 threads: int = EMBED_THREADS, max_length: int = 512):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        from huggingface_hub import hf_hub_download
+
+        self.model_name = model_name
+        self.query_instruction = query_instruction(self)
+
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(model_name, "tokenizer.json", cache_dir=cache_dir))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            hf_hub_download(model_name, "onnx/model.onnx", cache_dir=cache_dir),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def get_text_embedding_batch(self, texts: list, **kwargs) -> list:
+        if not texts:
+            return []
+        encodings = self.tokenizer.encode_batch(list(texts))
+        inputs = {
+            "input_ids": np.asarray([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.asarray([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.asarray([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+        cls = hidden[:, 0]
+        cls /= np.maximum(np.linalg.norm(cls, axis=1, keepdims=True), 1e-12)
+        return cls.tolist()
+
+    def get_text_embedding(self, text: str) -> list:
+        return self.get_text_embedding_batch([text])[0]
+
+    def get_query_embedding(self, query: str) -> list:
+        return self.get_text_embedding_batch([f"{self.query_instruction}{query}"])[0]
+
+def load_query_embedder(backend: str = EMBED_BACKEND, model_name: str = EMBED_MODEL_NAME):
+    """
+    Embedding model for serving queries. `onnx` (the default) avoids loading
+    torch; it falls back to llama_index's HuggingFaceEmbedding when
+    onnxruntime/tokenizers are not installed or the ONNX export can't be
+    loaded. Without llama_index (the serving image) the ONNX error is raised.
+    """
+    onnx_error = None
+    if backend == "onnx":
+        try:
+            return OnnxQueryEmbedder(model_name)
+        except Exception as e:
+            onnx_error = e
+
+    try:
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+    except ImportError:
+        if onnx_error is not None:
+            raise onnx_error
+        raise
+    if onnx_error is not None:
+        print(f"[WARN] ONNX query embedder unavailable ({onnx_error}). Falling back to HuggingFaceEmbedding...")
+    return HuggingFaceEmbedding(model_name=model_name, cache_folder=EMBED_CACHE_DIR)
@@ -0,0 +1,223 @@
+import os
+import json
+import numpy as np
+from pymilvus import MilvusClient, DataType
+from helper.quantize import to_float16, to_binary, cosine_scores
+from helper.query_embedder import query_instruction
+
+SEARCH_PARAMS = {'metric_type': 'COSINE', 'params': {'nprobe': 10}}
+BINARY_SEARCH_PARAMS = {'metric_type': 'HAMMING', 'params': {'nprobe': 10}}
+RESCORE_FACTOR = 4  # Binary mode: candidates fetched per requested hit for rescoring
+
+# Short fields returned by searches; the full `context` is fetched separately for the chunks actually used
+CITATION_FIELDS = ['doc_type', 'source_path', 'heading_path']
+
+# Score-aware retrieval (see select_hits). Per-course values calibrated with
+# calibrate_retrieval.py live in data/retrieval_thresholds.json.
+DEFAULT_THRESHOLDS = {
+    "cutoff": 0.4,   # Top cosine score below which nothing retrieved is considered relevant
+    "window": 0.15,  # Hits scoring more than this below the top hit are dropped
+    "gap": 0.08,     # Stop at the first drop between consecutive hits larger than this
+    "min_k": 1,
+    "max_k": 5,
+}
+
+_vector_modes = {}
+
+def collection_vector_mode(client: MilvusClient, collection_name: str) -> str:
+    """
+    Works out how a collection stores its vectors (see create_collection) from
+    its schema. Cached per collection, since the schema only changes on rebuild;
+    a failed search drops the entry so a rebuilt collection is re-checked.
+    int8 collections are reported as float32: IVF_SQ8 takes float32 queries.
+    """
+    if collection_name not in _vector_modes:
+        fields = {f["name"]: f["type"] for f in client.describe_collection(collection_name)["fields"]}
+        if "embedding_bin" in fields:
+            mode = "binary"
+        elif fields.get("embedding") == DataType.FLOAT16_VECTOR:
+            mode = "float16"
+        else:
+            mode = "float32"
+        _vector_modes[collection_name] = mode
+    return _vector_modes[collection_name]
+
+def as_vector(value) -> np.ndarray:
+    # FLOAT16_VECTOR fields come back as raw bytes
+    if isinstance(value, (bytes, bytearray)):
+        return np.frombuffer(value, dtype=np.float16).astype(np.float32)
+    if isinstance(value, list) and value and isinstance(value[0], (bytes, bytearray)):
+        return np.frombuffer(value[0], dtype=np.float16).astype(np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+def doc_type_filter(doc_types: list) -> str:
+    """Milvus boolean expression restricting a search to the given document types."""
+    if not doc_types:
+        return ""
+    return "doc_type in [" + ", ".join(json.dumps(doc_type) for doc_type in doc_types) + "]"
+
+def search_collection_batch(client: MilvusClient, collection_name: str, query_embeds: list, limit: int = 5,
+                            output_fields: list = None, rescore_candidates: int = None, filter: str = "") -> list:
+    """
+    Top-`limit` hits for each query embedding in one multi-vector search call,
+    whatever the collection's vector mode. Binary collections are searched by
+    Hamming distance first, then the best `rescore_candidates` per query are
+    rescored by cosine against their float16 vectors. `filter` is a Milvus
+    boolean expression over the scalar fields (see doc_type_filter).
+    Returns one list of Milvus hits (dicts with 'id', 'distance' and 'entity')
+    per query, in query order.
+    """
+    if not len(query_embeds):
+        return []
+    mode = collection_vector_mode(client, collection_name)
+    try:
+        return _search_mode(client, collection_name, mode, query_embeds, limit,
+                            output_fields or ['context'], rescore_candidates, filter)
+    except Exception:
+        _vector_modes.pop(collection_name, None)
+        raise
+
+def _search_mode(client: MilvusClient, collection_name: str, mode: str, query_embeds: list, limit: int,
+                 output_fields: list, rescore_candidates: int, filter: str) -> list:
+    if mode == "float16":
+        results = client.search(
+            collection_name=collection_name,
+            data=[to_float16(query_embed) for query_embed in query_embeds],
+            anns_field="embedding",
+            search_params=SEARCH_PARAMS,
+            output_fields=output_fields,
+            limit=limit,
+            filter=filter,
+        )
+        return [list(hits) for hits in results]
+
+    if mode == "binary":
+        queries = np.asarray(query_embeds, dtype=np.float32)
+        results = client.search(
+            collection_name=collection_name,
+            data=[to_binary(query).tobytes() for query in queries],
+            anns_field="embedding_bin",
+            search_params=BINARY_SEARCH_PARAMS,
+            output_fields=output_fields + ['embedding'],
+            limit=rescore_candidates or RESCORE_FACTOR * limit,
+            filter=filter,
+        )
+        rescored = []
+        for query, hits in zip(queries, results):
+            hits = list(hits)
+            if not hits:
+                rescored.append([])
+                continue
+            vectors = np.stack([as_vector(hit['entity'].pop('embedding')) for hit in hits])
+            scores = cosine_scores(query[None, :], vectors)[0]
+            for hit, score in zip(hits, scores):
+                hit['distance'] = float(score)
+            rescored.append(sorted(hits, key=lambda hit: hit['distance'], reverse=True)[:limit])
+        return rescored
+
+    results = client.search(
+        collection_name=collection_name,
+        data=list(query_embeds),
+        anns_field="embedding",
+        search_params=SEARCH_PARAMS,
+        output_fields=output_fields,
+        limit=limit,
+        filter=filter,
+    )
+    return [list(hits) for hits in results]
+
+def search_collection(client: MilvusClient, collection_name: str, query_embed, limit: int = 5,
+                      output_fields: list = None, rescore_candidates: int = None, filter: str = "") -> list:
+    """Top-`limit` hits for one query embedding (see search_collection_batch)."""
+    return search_collection_batch(
+        client, collection_name, [query_embed], limit=limit,
+        output_fields=output_fields, rescore_candidates=rescore_candidates, filter=filter
+    )[0]
+
+def embed_queries(embed_model, queries: list) -> list:
+    """
+    Embeds many queries in one batched forward pass. Equivalent to calling
+    get_query_embedding per query: the model's query instruction (BGE's
+    "Represent this question...") is prepended before batch text embedding.
+    """
+    instruction = query_instruction(embed_model)
+    return embed_model.get_text_embedding_batch([f"{instruction}{query}" for query in queries])
+
+def retrieve_many(client: MilvusClient, embed_model, requests: list, collections: dict, limit: int = 5,
+                  output_fields: list = None, filter: str = "") -> list:
+    """
+    Retrieval for many (course_id, query) pairs at once: all distinct queries
+    are embedded in one batch, then each collection gets a single multi-vector
+    search. `collections` maps course_id → collection name. Returns one hit
+    list per request, in request order.
+    """
+    unique_queries = list(dict.fromkeys(query for _, query in requests))
+    embeddings = dict(zip(unique_queries, embed_queries(embed_model, unique_queries))) if unique_queries else {}
+
+    # Group the distinct queries of every collection so each is searched once
+    per_collection = {}
+    for course_id, query in requests:
+        per_collection.setdefault(collections[course_id], {})[query] = None
+
+    results = {}
+    for collection_name, queries in per_collection.items():
+        queries = list(queries)
+        hits = search_collection_batch(
+            client, collection_name, [embeddings[query] for query in queries],
+            limit=limit, output_fields=output_fields, filter=filter
+        )
+        for query, query_hits in zip(queries, hits):
+            results[(collection_name, query)] = query_hits
+
+    return [results[(collections[course_id], query)] for course_id, query in requests]
+
+def load_retrieval_thresholds(path: str) -> dict:
+    """Per-course thresholds ({course_id: {...}}), each filled in from DEFAULT_THRESHOLDS."""
+    per_course = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            per_course = json.load(f)
+    return {course_id: {**DEFAULT_THRESHOLDS, **values} for course_id, values in per_course.items()}
+
+def select_hits(hits: list, thresholds: dict = None) -> list:
+    """
+    Score-aware depth: of the hits of one search (best first, fetched with
+    limit=max_k), keeps those within `window` of the top score, stopping at
+    the first similarity `gap` (always at least `min_k`). Returns [] when
+    even the top hit scores below `cutoff`, i.e. the question can't be
+    answered from the course documents.
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    hits = sorted(hits, key=lambda hit: hit['distance'], reverse=True)[:thresholds["max_k"]]
+    if not hits or hits[0]['distance'] < thresholds["cutoff"]:
+        return []
+
+    kept = hits[:1]
+    for previous, hit in zip(hits, hits[1:]):
+        if len(kept) >= thresholds["min_k"] and (
+            hits[0]['distance'] - hit['distance'] > thresholds["window"]
+            or previous['distance'] - hit['distance'] > thresholds["gap"]
+        ):
+            break
+        kept.append(hit)
+    return kept
+
+def fetch_contexts(client: MilvusClient, collection_name: str, hits: list) -> list:
+    """Full chunk text for the given hits, in hit order (one primary-key lookup)."""
+    if not hits:
+        return []
+    ids = [hit['id'] for hit in hits]
+    rows = client.get(collection_name=collection_name, ids=ids, output_fields=['context'])
+    contexts = {row['id']: row['context'] for row in rows}
+    return [contexts.get(id_, "") for id_ in ids]
+
+def list_doc_types(client: MilvusClient, collection_name: str) -> list:
+    """Distinct document types in a collection (reads only the small doc_type column)."""
+    rows = client.query(collection_name=collection_name, filter="id >= 0", output_fields=['doc_type'], limit=16384)
+    return sorted({row['doc_type'] for row in rows if row.get('doc_type')})
+
+def format_citation(hit: dict) -> str:
+    entity = hit['entity']
+    heading_path = (entity.get('heading_path') or "").replace(">", " › ")
+    doc_type = (entity.get('doc_type') or "").replace("_", " ")
+    return f"{doc_type}: {heading_path}" if heading_path else doc_type
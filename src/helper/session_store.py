@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+def new_session() -> dict:
+    # `seq` numbers every message ever added; `summary_upto` is the last seq folded into `summary`;
+    # `dropped` counts messages trimmed before they were folded
+    return {"messages": [], "summary": "", "summary_upto": 0, "seq": 0, "dropped": 0}
+
+def session_chars(session: dict) -> int:
+    return len(session["summary"]) + sum(len(m["content"]) for m in session["messages"])
+
+class SQLiteBackend:
+    """Durable session storage: one JSON row per session in a local SQLite file."""
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def load(self, session_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, session_id: str, session: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(session, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def prune(self, max_age: float):
+        """Deletes sessions idle for more than `max_age` seconds."""
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - max_age,))
+            self._conn.commit()
+
+class SessionStore:
+    """
+    Chat history per session, kept outside st.session_state.
+
+    Hot sessions live in an in-memory LRU of at most `max_sessions`. With a
+    `backend` every change is also written through, so sessions evicted from
+    memory (or lost on restart) are reloaded on their next access. Each
+    session is capped at `max_messages` and `max_chars`; the oldest messages
+    are dropped first. Usually fold_history has folded them into the rolling
+    summary by then; turns that never reach the LLM (FAQ or no-answer
+    replies) may not have been, and those are counted in `dropped` so the
+    LLM is told part of the conversation is missing. Sessions idle for more than `max_age` seconds are
+    pruned from the backend at most once every `prune_interval` seconds.
+    """
+    def __init__(self, max_sessions: int = 1000, max_messages: int = 100, max_chars: int = 200_000, backend=None,
+                 max_age: float = 30 * 24 * 3600, prune_interval: float = 3600):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.backend = backend
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._sessions = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _load(self, session_id: str) -> dict:
+        if session_id in self._sessions:
+            self._sessions.move_to_end(session_id)
+            return self._sessions[session_id]
+
+        session = (self.backend.load(session_id) if self.backend else None) or new_session()
+        self._sessions[session_id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def _save(self, session_id: str, session: dict):
+        if self.backend:
+            self.backend.save(session_id, session)
+            if time.time() - self._last_prune > self.prune_interval:
+                self._last_prune = time.time()
+                self.backend.prune(self.max_age)
+
+    def get(self, session_id: str) -> dict:
+        """Snapshot of a session (messages, summary, summary_upto, seq)."""
+        with self._lock:
+            session = self._load(session_id)
+            return {**session, "messages": list(session["messages"])}
+
+    def append(self, session_id: str, message: dict):
+        with self._lock:
+            session = self._load(session_id)
+            session["seq"] += 1
+            session["messages"].append({**message, "seq": session["seq"]})
+            while len(session["messages"]) > 1 and (
+                len(session["messages"]) > self.max_messages or session_chars(session) > self.max_chars
+            ):
+                dropped = session["messages"].pop(0)
+                if dropped["seq"] > session["summary_upto"]:
+                    session["dropped"] = session.get("dropped", 0) + 1
+            self._save(session_id, session)
+
+    def set_summary(self, session_id: str, summary: str, summary_upto: int):
+        with self._lock:
+            session = self._load(session_id)
+            session["summary"] = summary
+            session["summary_upto"] = summary_upto
+            self._save(session_id, session)
+
+    def reset(self, session_id: str):
+        with self._lock:
+            self._sessions[session_id] = new_session()
+            self._sessions.move_to_end(session_id)
+            self._save(session_id, self._sessions[session_id])
+
+    def fold_history(self, session_id: str, summarise, window: int = 6, batch: int = 6) -> list:
+        """
+        Messages to send to the LLM: the rolling summary (as a system message)
+        plus the messages not yet summarised. Once more than `window + batch`
+        messages are unsummarised, everything but the last `window` is folded
+        into the summary with `summarise(previous_summary, messages) -> str`,
+        so prompt size stays bounded however long the conversation gets.
+        """
+        session = self.get(session_id)
+        pending = [m for m in session["messages"] if m["seq"] > session["summary_upto"]]
+
+        if len(pending) > window + batch:
+            to_fold, pending = pending[:-window], pending[-window:]
+            try:
+                summary = summarise(session["summary"], to_fold)
+                self.set_summary(session_id, summary, to_fold[-1]["seq"])
+                session["summary"] = summary
+            except Exception as e:
+                # Keep the conversation going on the recent window if summarising fails
+                print(f"[WARN] Failed to summarise history for session {session_id}: {e}")
+
+        history = []
+        if session["summary"]:
+            history.append({"role": "system", "content": f"Summary of the earlier conversation:\n{session['summary']}"})
+        if session.get("dropped"):
+            history.append({"role": "system", "content": f"{session['dropped']} earlier messages were dropped without being summarised."})
+        history.extend({"role": m["role"], "content": m["content"]} for m in pending)
+        return history
+
+def store_from_env() -> SessionStore:
+    """SESSION_STORE=memory (default) or sqlite (file at SESSION_DB, idle sessions kept SESSION_MAX_AGE_DAYS)."""
+    backend = None
+    if os.getenv("SESSION_STORE", "memory") == "sqlite":
+        backend = SQLiteBackend(os.getenv("SESSION_DB", "cache/sessions.db"))
+    return SessionStore(
+        max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "1000")),
+        max_messages=int(os.getenv("SESSION_MAX_MESSAGES", "100")),
+        backend=backend,
+        max_age=float(os.getenv("SESSION_MAX_AGE_DAYS", "30")) * 24 * 3600,
+    )
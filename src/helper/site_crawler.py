@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import requests
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin, urldefrag
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from helper.html_parser import DEFAULT_HEADERS, extract_text_from_html, find_embedded_exports, chunk_text
+
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+
+def content_type(headers) -> str:
+    """Media type of a response without parameters, e.g. 'text/html' for 'text/html; charset=utf-8'."""
+    return (headers.get("Content-Type") or "").split(";")[0].strip().lower()
+
+class HttpCache:
+    """
+    On-disk response cache keyed by URL. Stores the body and its content type
+    together with the ETag/Last-Modified validators so unchanged pages can be
+    revalidated with a conditional request instead of being downloaded again.
+    """
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def load(self, url: str):
+        path = self._path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, url: str, response: requests.Response):
+        entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "content_type": content_type(response.headers),
+            "body": response.text,
+        }
+        # Write to a temp file first so concurrent readers never see a partial entry
+        path = self._path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+class SiteFetcher:
+    """
+    Fetches pages over one pooled HTTP session with bounded concurrency,
+    revalidating against the on-disk cache (If-None-Match / If-Modified-Since).
+    """
+    def __init__(self, cache_dir: str, max_workers: int = 8, timeout: float = 30.0, retries: int = 3):
+        self.cache = HttpCache(cache_dir)
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(
+            pool_connections=max_workers,
+            pool_maxsize=max_workers,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET"],
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.stats = {"fetched": 0, "not_modified": 0, "stale": 0, "failed": 0, "skipped": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _accept(self, url: str, media_type: str, content_types) -> bool:
+        # media_type is None for cache entries written before content types were recorded
+        if content_types is None or media_type is None or media_type in content_types:
+            return True
+        print(f"[INFO] Skipping {url}: {media_type or 'no content type'}")
+        self._count("skipped")
+        return False
+
+    def fetch(self, url: str, content_types: tuple = None):
+        """
+        Fetches a single URL, returning its body (or None on failure). With
+        `content_types`, responses of any other media type are skipped (None)
+        and not cached.
+        """
+        cached = self.cache.load(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached:
+                if not self._accept(url, cached.get("content_type"), content_types):
+                    return None
+                self._count("not_modified")
+                return cached["body"]
+            response.raise_for_status()
+            if not self._accept(url, content_type(response.headers), content_types):
+                return None
+            self.cache.store(url, response)
+            self._count("fetched")
+            return response.text
+        except requests.exceptions.RequestException as e:
+            if cached and self._accept(url, cached.get("content_type"), content_types):
+                print(f"[WARN] Error fetching {url}: {e}. Using cached copy.")
+                self._count("stale")
+                return cached["body"]
+            print(f"[ERR] Error fetching {url}: {e}")
+            self._count("failed")
+            return None
+
+    def fetch_many(self, urls: list, content_types: tuple = None) -> dict:
+        """Fetches URLs concurrently (at most `max_workers` in flight). Returns {url: body}."""
+        unique_urls = list(dict.fromkeys(urls))
+        if not unique_urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            bodies = list(pool.map(lambda url: self.fetch(url, content_types), unique_urls))
+        return dict(zip(unique_urls, bodies))
+
+    def close(self):
+        self.session.close()
+
+def default_scope(url: str) -> str:
+    """Crawl scope for a start URL: everything under its parent path."""
+    url, _ = urldefrag(url)
+    return url.rsplit("/", 1)[0] + "/"
+
+def find_site_links(html_content: str, base_url: str, scopes: list) -> list:
+    """Returns the absolute in-scope links of a page, without fragments."""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    links = []
+    for a in soup.find_all('a', href=True):
+        link, _ = urldefrag(urljoin(base_url, a['href']))
+        if any(link.startswith(scope) for scope in scopes):
+            links.append(link)
+    return links
+
+def page_title(html_content: str, default: str) -> str:
+    soup = BeautifulSoup(html_content, 'html.parser')
+    if soup.title and soup.title.get_text(strip=True):
+        return soup.title.get_text(strip=True)
+    return default
+
+def crawl_site(start_urls: list, fetcher: SiteFetcher, max_pages: int = 50, scopes: list = None) -> dict:
+    """
+    Breadth-first crawl from `start_urls`, following links that stay inside
+    `scopes`. Each BFS level is fetched concurrently. Only HTML responses
+    are kept and followed (PDFs, images etc. linked from a page are skipped).
+    Returns {url: html}.
+    """
+    scopes = scopes or [default_scope(url) for url in start_urls]
+    seen = set(start_urls)
+    frontier = list(dict.fromkeys(start_urls))
+    pages = {}
+
+    while frontier and len(pages) < max_pages:
+        batch = frontier[:max_pages - len(pages)]
+        fetched = fetcher.fetch_many(batch, content_types=HTML_TYPES)
+
+        next_frontier = []
+        for url in batch:
+            html = fetched.get(url)
+            if not html:
+                continue
+            pages[url] = html
+            for link in find_site_links(html, url, scopes):
+                if link not in seen:
+                    seen.add(link)
+                    next_frontier.append(link)
+        # Same-level URLs beyond this batch's budget go first, so skipped or failed pages don't lose them
+        frontier = frontier[len(batch):] + next_frontier
+
+    return pages
+
+def process_site(start_urls: list, course_id: str, output_dir: str = "data", cache_dir: str = "cache/http",
+                 max_pages: int = 50, max_workers: int = 8, chunk_size: int = 500) -> list:
+    """
+    Crawls a course site (e.g. a Google Site) and saves its chunks to
+    `{output_dir}/{course_id}_site_data.json`, in the same record format as
+    `process_pdf` (`source_path` holds the page URL).
+    """
+    fetcher = SiteFetcher(cache_dir=cache_dir, max_workers=max_workers)
+    try:
+        pages = crawl_site(start_urls, fetcher, max_pages=max_pages)
+        print(f"[INFO] Crawled {len(pages)} pages for {course_id}")
+
+        # Prefetch every embedded Google Doc/Sheet across all pages in one concurrent wave
+        export_urls = [u for url, html in pages.items() for u in find_embedded_exports(html, url)]
+        embedded = fetcher.fetch_many(export_urls)
+        print(f"[INFO] Fetched {len(embedded)} embedded documents for {course_id}")
+    finally:
+        fetcher.close()
+
+    final_data = []
+    for url, html in pages.items():
+        title = page_title(html, default=url)
+        text = extract_text_from_html(html, url, fetch=embedded.get)
+        for chunk in chunk_text(text, chunk_size=chunk_size):
+            final_data.append({
+                "text": chunk,
+                "metadata": {
+                    "course_id": course_id,
+                    "source_path": url,
+                    "doc_type": "site",
+                    "heading": title,
+                    "heading_level": 1,
+                    "heading_path": title
+                }
+            })
+
+    print(f"[INFO] HTTP stats for {course_id}: {fetcher.stats}")
+
+    if final_data:
+        os.makedirs(output_dir, exist_ok=True)
+        output_file = os.path.join(output_dir, f"{course_id}_site_data.json")
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(final_data, f, ensure_ascii=False, indent=4)
+        print(f"[INFO] Successfully created {output_file} with {len(final_data)} records.")
+    else:
+        print(f"[WARN] No site records were generated for {course_id}.")
+
+    return final_data
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from helper.courses import discover_courses, collection_name
+from helper.quantize import load_vector_modes
+from helper.faq import faq_sources
+
+# Numbered stage scripts can't be imported with a plain import statement
+ingest_data = importlib.import_module("1_ingest_data")
+dedup_chunks = importlib.import_module("1b_dedup_chunks")
+build_faq = importlib.import_module("2b_build_faq")
+
+PIPELINE_VERSION = 2  # Bump to invalidate every checkpoint after changing stage logic
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def fingerprint(paths: list, params: dict = None) -> str:
+    """Hash of the content of every input file plus the stage parameters."""
+    h = hashlib.sha256(json.dumps({"version": PIPELINE_VERSION, "params": params or {}}, sort_keys=True).encode())
+    for path in sorted(paths):
+        if os.path.exists(path):
+            h.update(os.path.basename(path).encode())
+            h.update(file_digest(path).encode())
+    return h.hexdigest()
+
+class Checkpoint:
+    """Stage fingerprints per course, persisted as JSON after every completed stage."""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def is_current(self, course_id: str, stage: str, stage_fingerprint: str) -> bool:
+        with self._lock:
+            return self.state.get(course_id, {}).get(stage, {}).get("fingerprint") == stage_fingerprint
+
+    def mark_done(self, course_id: str, stage: str, stage_fingerprint: str):
+        with self._lock:
+            self.state.setdefault(course_id, {})[stage] = {
+                "fingerprint": stage_fingerprint,
+                "completed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, indent=4)
+            os.replace(tmp_path, self.path)
+
+class Stage:
+    """
+    One node of the graph. `inputs`/`outputs` are evaluated lazily because
+    the inputs of a stage only exist once its dependencies have run.
+    """
+    def __init__(self, course_id, name, run, inputs, outputs, deps=(), params=None, is_done=None):
+        self.course_id = course_id
+        self.name = name
+        self.run = run
+        self.inputs = inputs
+        self.outputs = outputs
+        self.deps = list(deps)
+        self.params = params or {}
+        self.is_done = is_done
+
+    @property
+    def key(self):
+        return f"{self.course_id}:{self.name}"
+
+def build_graph(root_dir: str, course_ids: list, page_workers: int, milvus_uri: str, faq_generate: bool = True,
+                ocr: bool = False) -> dict:
+    """Builds the per-course stage chain for every course. Returns {key: Stage}."""
+    data_dir = os.path.join(root_dir, "data")
+    vector_modes = load_vector_modes(os.path.join(data_dir, "vector_modes.json"))
+    stages = {}
+
+    def add(stage):
+        stages[stage.key] = stage
+        return stage
+
+    for course_id in course_ids:
+        docs_dir = os.path.join(root_dir, "pdfs", course_id.lower())
+        data_file = os.path.join(data_dir, f"{course_id}_data.json")
+        site_file = os.path.join(data_dir, f"{course_id}_site_data.json")
+        dedup_file = os.path.join(data_dir, f"{course_id}_dedup_data.json")
+        embeddings_file = os.path.join(data_dir, f"{course_id}_embeddings.json")
+        curated_faq_file = os.path.join(root_dir, "faq", f"{course_id}.json")
+        faq_file = os.path.join(data_dir, f"{course_id}_faq.json")
+        vector_mode = vector_modes.get(course_id, "float32")
+
+        ingest = add(Stage(
+            course_id, "ingest",
+            run=lambda c=course_id, d=docs_dir: ingest_data.process_pdf(
+                docs_dir=d, course_id=c, output_dir=data_dir, max_workers=page_workers, ocr=ocr),
+            inputs=lambda d=docs_dir: [os.path.join(d, f) for f in os.listdir(d) if f.endswith(".pdf")],
+            outputs=lambda f=data_file: [f],
+            params={"ocr": ocr},
+        ))
+        # Dedup never merges across courses, so running it per course keeps the chains independent
+        dedup = add(Stage(
+            course_id, "dedup",
+            run=lambda c=course_id: dedup_chunks.dedup_courses(data_dir, [c]),
+            inputs=lambda f=data_file, s=site_file: [f, s],
+            outputs=lambda f=dedup_file: [f],
+            deps=[ingest.key],
+        ))
+        embed = add(Stage(
+            course_id, "embed",
+            run=lambda i=dedup_file, o=embeddings_file, m=vector_mode: importlib.import_module("2_gen_embeddings").generate_embeddings(i, o, vector_mode=m),
+            inputs=lambda f=dedup_file: [f],
+            outputs=lambda f=embeddings_file: [f],
+            deps=[dedup.key],
+            params={"vector_mode": vector_mode},
+        ))
+        add(Stage(
+            course_id, "index",
+            run=lambda c=course_id, e=embeddings_file, m=vector_mode: index_course(milvus_uri, c, e, m),
+            inputs=lambda f=embeddings_file: [f],
+            outputs=lambda: [],
+            deps=[embed.key],
+            params={"vector_mode": vector_mode},
+            is_done=lambda c=course_id: has_collection(milvus_uri, c),
+        ))
+        # Only re-run when the course_team/assessment/timetable PDFs or the curated pairs change
+        add(Stage(
+            course_id, "faq",
+            run=lambda c=course_id, d=docs_dir, i=data_file, q=curated_faq_file, o=faq_file: build_faq.build_faq(
+                c, d, i, q, o, generate=faq_generate),
+            inputs=lambda d=docs_dir, q=curated_faq_file: faq_sources(d) + [q],
+            outputs=lambda f=faq_file: [f],
+            deps=[ingest.key],
+            params={"generate": faq_generate},
+        ))
+    return stages
+
+def index_course(milvus_uri: str, course_id: str, embeddings_file: str, vector_mode: str):
+    from pymilvus import MilvusClient
+    vector_indexing = importlib.import_module("3_vector_indexing")
+    vector_indexing.index_course(MilvusClient(uri=milvus_uri), course_id, embeddings_file, vector_mode)
+
+def has_collection(milvus_uri: str, course_id: str) -> bool:
+    from pymilvus import MilvusClient
+    return MilvusClient(uri=milvus_uri).has_collection(collection_name(course_id))
+
+def run_stage(stage: Stage, checkpoint: Checkpoint, force: bool) -> str:
+    """Runs a stage unless it is up to date. Returns 'ran' or 'skipped'."""
+    stage_fingerprint = fingerprint(stage.inputs(), stage.params)
+    up_to_date = (
+        not force
+        and checkpoint.is_current(stage.course_id, stage.name, stage_fingerprint)
+        and all(os.path.exists(path) for path in stage.outputs())
+        and (stage.is_done is None or stage.is_done())
+    )
+    if up_to_date:
+        print(f"[INFO] {stage.key} is up to date - skipping")
+        return "skipped"
+
+    print(f"[INFO] Running {stage.key}...")
+    stage.run()
+    missing = [path for path in stage.outputs() if not os.path.exists(path)]
+    if missing:
+        raise RuntimeError(f"{stage.key} did not produce {missing}")
+    checkpoint.mark_done(stage.course_id, stage.name, stage_fingerprint)
+    return "ran"
+
+def run_graph(stages: dict, checkpoint: Checkpoint, jobs: int, force: bool = False) -> dict:
+    """
+    Runs every stage once all of its dependencies have succeeded. When a
+    stage fails, the stages downstream of it are not run; the rest of the
+    graph carries on. Returns {key: 'ran' | 'skipped' | 'failed' | 'blocked'}.
+    """
+    status = {}
+    pending = dict(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for key, stage in list(pending.items()):
+                dep_status = [status.get(dep) for dep in stage.deps]
+                if any(s in ("failed", "blocked") for s in dep_status):
+                    status[key] = "blocked"
+                    del pending[key]
+                elif all(s in ("ran", "skipped") for s in dep_status):
+                    running[pool.submit(run_stage, stage, checkpoint, force)] = key
+                    del pending[key]
+
+            if not running:
+                # Nothing left that can be scheduled (e.g. a dependency missing from the graph)
+                for key in pending:
+                    status[key] = "blocked"
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = running.pop(future)
+                try:
+                    status[key] = future.result()
+                except Exception as e:
+                    print(f"[ERROR] {key} failed: {e}")
+                    status[key] = "failed"
+    return status
+
+if __name__ == "__main__":
+    this_dir = os.path.dirname(__file__)
+    root_dir = os.path.abspath(os.path.join(this_dir, ".."))
+
+    parser = argparse.ArgumentParser(description="Run the ingest → dedup → embed → index (+ FAQ) pipeline.")
+    parser.add_argument("--courses", nargs="*", help="Only run these courses (default: every directory in pdfs/)")
+    parser.add_argument("--jobs", type=int, default=None, help="Courses processed in parallel (default: all)")
+    parser.add_argument("--force", action="store_true", help="Re-run every stage even if its inputs are unchanged")
+    parser.add_argument("--milvus-uri", default=os.getenv("MILVUS_URI", "http://milvus_db:19530"))
+    parser.add_argument("--no-faq-generate", action="store_true", help="Build the FAQ index from faq/ pairs only")
+    parser.add_argument("--ocr", action="store_true", help="OCR image-only PDF pages (needs unstructured[pdf] and tesseract)")
+    args = parser.parse_args()
+
+    course_ids = args.courses or discover_courses(os.path.join(root_dir, "pdfs"))
+    if not course_ids:
+        print("[WARN] No courses found in pdfs/ - Nothing to do...")
+        raise SystemExit(0)
+
+    jobs = args.jobs or len(course_ids)
+    # Split the cores between courses so parallel ingests don't oversubscribe the machine
+    page_workers = max(1, (os.cpu_count() or 1) // jobs)
+
+    os.makedirs(os.path.join(root_dir, "data"), exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(root_dir, "data", ".pipeline_state.json"))
+    stages = build_graph(root_dir, course_ids, page_workers, args.milvus_uri, faq_generate=not args.no_faq_generate,
+                         ocr=args.ocr)
+    status = run_graph(stages, checkpoint, jobs=jobs, force=args.force)
+
+    for key in stages:
+        print(f"[INFO] {key}: {status.get(key)}")
+    if any(s in ("failed", "blocked") for s in status.values()):
+        raise SystemExit(1)
@@ -0,0 +1,111 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from helper.site_crawler import SiteFetcher, crawl_site  # noqa: E402
+
+INDEX = b'<html><head><title>Course</title></head><body><a href="page2.html">Next</a><a href="notes.pdf">Notes</a></body></html>'
+PAGE2 = b"<html><body><p>Coursework is due in week 10.</p></body></html>"
+HUB = b'<html><body><a href="notes.pdf">Notes</a><a href="page2.html">Next</a></body></html>'
+
+class Handler(BaseHTTPRequestHandler):
+    """Tiny course site: two HTML pages with ETags, a PDF, and a page that can be switched to fail."""
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/site/flaky.html" and self.server.failing:
+            self.send_response(500)
+            self.end_headers()
+            return
+        routes = {
+            "/site/index.html": ("text/html; charset=utf-8", INDEX, '"index-v1"'),
+            "/site/page2.html": ("text/html", PAGE2, '"page2-v1"'),
+            "/site/hub.html": ("text/html", HUB, None),
+            "/site/flaky.html": ("text/html", PAGE2, '"flaky-v1"'),
+            "/site/notes.pdf": ("application/pdf", b"%PDF-1.4 not really", None),
+        }
+        if self.path not in routes:
+            self.send_response(404)
+            self.end_headers()
+            return
+        media_type, body, etag = routes[self.path]
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", media_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class SiteFetcherTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.requests = []
+        self.server.failing = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}/site/"
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.fetcher = self.new_fetcher()
+
+    def tearDown(self):
+        self.fetcher.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.cache_dir.cleanup()
+
+    def new_fetcher(self) -> SiteFetcher:
+        return SiteFetcher(cache_dir=self.cache_dir.name, max_workers=2, timeout=5, retries=0)
+
+    def test_fetch_stores_200_in_cache(self):
+        self.assertEqual(self.fetcher.fetch(self.base + "page2.html"), PAGE2.decode())
+        self.assertEqual(self.fetcher.stats["fetched"], 1)
+        entry = self.fetcher.cache.load(self.base + "page2.html")
+        self.assertEqual(entry["etag"], '"page2-v1"')
+        self.assertEqual(entry["content_type"], "text/html")
+
+    def test_etag_revalidation_serves_cached_body_on_304(self):
+        self.fetcher.fetch(self.base + "page2.html")
+        second = self.new_fetcher()
+        try:
+            self.assertEqual(second.fetch(self.base + "page2.html"), PAGE2.decode())
+            self.assertEqual(second.stats["not_modified"], 1)
+        finally:
+            second.close()
+        self.assertEqual(self.server.requests[-1], ("/site/page2.html", '"page2-v1"'))
+
+    def test_stale_cached_copy_on_server_error(self):
+        self.fetcher.fetch(self.base + "flaky.html")
+        self.server.failing = True
+        self.assertEqual(self.fetcher.fetch(self.base + "flaky.html"), PAGE2.decode())
+        self.assertEqual(self.fetcher.stats["stale"], 1)
+
+    def test_error_without_cache_returns_none(self):
+        self.server.failing = True
+        self.assertIsNone(self.fetcher.fetch(self.base + "flaky.html"))
+        self.assertEqual(self.fetcher.stats["failed"], 1)
+
+    def test_crawl_follows_only_html(self):
+        pages = crawl_site([self.base + "index.html"], self.fetcher, max_pages=10)
+        self.assertEqual(sorted(pages), [self.base + "index.html", self.base + "page2.html"])
+        self.assertEqual(self.fetcher.stats["skipped"], 1)
+        self.assertIsNone(self.fetcher.cache.load(self.base + "notes.pdf"))
+
+    def test_skipped_pdf_frees_budget_for_same_level_page(self):
+        # The budget left after the start page only covers the PDF; once it is skipped, page2 must still be crawled
+        pages = crawl_site([self.base + "hub.html"], self.fetcher, max_pages=2)
+        self.assertEqual(sorted(pages), [self.base + "hub.html", self.base + "page2.html"])
+        self.assertEqual(self.fetcher.stats["skipped"], 1)
+
+if __name__ == "__main__":
+    unittest.main()